@@ -1,14 +1,48 @@
+import os
 from flask import Flask
 from flask_restx import Api
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
+from werkzeug.utils import import_string
+from app.emails import EmailChecker
+from app.hashing import PasswordHasher
+from app.instrumentation import SQLInstrumentation
+from app.persistence import fulltext
+from app.persistence.engine import configure_engines
+from app.persistence.routing import RoutingSession
+from app.ratelimit import LoginRateLimiter
+
+# Alembic environment and revisions, next to the app package
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'migrations')
 
 jwt = JWTManager()
 
-bcrypt = Bcrypt()
+password_hasher = PasswordHasher()
+
+email_checker = EmailChecker()
+
+login_limiter = LoginRateLimiter()
+
+# Reads go to the replicas of READ_REPLICA_BINDS when there are some
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+migrate = Migrate()
 
-db = SQLAlchemy()
+sql_metrics = SQLInstrumentation()
+
+
+@jwt.user_lookup_loader
+def load_principal(_jwt_header, jwt_data):
+    """Resolve the user of a token into a cached Principal.
+
+    flask-jwt-extended calls this once per request and keeps the result
+    for the request (`get_current_user()`); a token whose user no longer
+    exists is rejected with a 401.
+    """
+    from app.services import facade
+    return facade.get_principal(jwt_data['sub'])
 
 
 def create_app(config_class="config.DevelopmentConfig"):
@@ -25,10 +59,17 @@ def create_app(config_class="config.DevelopmentConfig"):
     from app.api.v1.places import api as places_ns
     from app.api.v1.reviews import api as reviews_ns
     from app.api.v1.auth import api as auth_ns
+    from app.api.v1.metrics import api as metrics_ns
+    from app.commands import hbnb_cli
 
     app = Flask(__name__)
+    if isinstance(config_class, str):
+        config_class = import_string(config_class)
     app.config.from_object(config_class)
-    bcrypt.init_app(app)
+    config_class.init_app(app)
+    password_hasher.init_app(app)
+    email_checker.init_app(app)
+    login_limiter.init_app(app)
     jwt.init_app(app)
 
     # Initialize Flask-RESTX API with documentation
@@ -41,6 +82,12 @@ def create_app(config_class="config.DevelopmentConfig"):
     )
 
     db.init_app(app)
+    configure_engines(app, db)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIR,
+                     render_as_batch=True,
+                     include_name=fulltext.include_name)
+    sql_metrics.init_app(app, db)
+    app.cli.add_command(hbnb_cli)
 
     # Register the users namespace
     api.add_namespace(users_ns, path='/api/v1/users')
@@ -52,5 +99,7 @@ def create_app(config_class="config.DevelopmentConfig"):
     api.add_namespace(reviews_ns, path='/api/v1/reviews')
     # Register the authentification namespace
     api.add_namespace(auth_ns, path='/api/v1/auth')
+    # Register the SQL metrics namespace
+    api.add_namespace(metrics_ns, path='/api/v1/_metrics')
 
     return app
@@ -1,6 +1,9 @@
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import jwt_required, get_current_user
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.api.v1.fieldsets import Fieldset
 
 api = Namespace('amenities', description='Amenity operations')
 
@@ -9,6 +12,10 @@ amenity_model = api.model('Amenity', {
     'name': fields.String(required=True, description='Name of the amenity')
 })
 
+# Fields of the amenity list
+amenity_fields = Fieldset({'id': 'id', 'name': 'name'},
+                          default=('id', 'name'))
+
 
 @api.route('/')
 class AmenityList(Resource):
@@ -35,26 +42,39 @@ class AmenityList(Resource):
         existing_amenity = facade.get_amenity_by_name(amenity_data['name'])
         if existing_amenity:
             return {'error': 'This amenity already exist'}, 400
-        new_amenity = facade.create_amenity(amenity_data)
+        try:
+            new_amenity = facade.create_amenity(amenity_data)
+        except IntegrityError:
+            # The same name was registered meanwhile
+            db.session.rollback()
+            return {'error': 'This amenity already exist'}, 400
 
         return {'id': new_amenity.id, 'name': new_amenity.name}, 201
 
+    @api.param('fields', 'Comma separated fields to return')
     @api.response(200, 'List of amenities retrieved successfully')
+    @api.response(400, 'Unknown field')
     def get(self):
         """
         Retrieve a list of all amenities.
 
         This endpoint returns a list of all amenities stored in the system.
+        The `fields` parameter selects the fields of each amenity.
 
         Returns:
             list: A JSON list of amenities, each containing an `id` and `name`,
             along with a 200 status code.
+            If a field is unknown, returns a 400 error.
         """
-        amenities = facade.get_all_amenities()
-        amenity_list = [{
-            'id': amenity.id,
-            'name': amenity.name,
-        } for amenity in amenities]
+        try:
+            names = amenity_fields.requested()
+        except ValueError as error:
+            return {'error': str(error)}, 400
+
+        amenities = facade.get_all_amenities(
+            columns=amenity_fields.columns(names))
+        amenity_list = [amenity_fields.serialize(amenity, names)
+                        for amenity in amenities]
 
         return amenity_list, 200
 
@@ -119,6 +139,10 @@ class AmenityResource(Resource):
             facade.update_amenity(amenity_id, update_data)
         except ValueError:
             return {'error': 'Invalid input data'}, 400
+        except IntegrityError:
+            # Another amenity took the name meanwhile
+            db.session.rollback()
+            return {'error': 'This amenity already exist'}, 400
 
         return {"message": "Amenity updated successfully"}
 
@@ -144,15 +168,18 @@ class AmenityResource(Resource):
             an error message with status code 400.
         """
 
-            additionnal_claim = get_jwt()
-            if not additionnal_claim["is_admin"]:
+            if not get_current_user().is_admin:
                 return {'error': 'Admin privileges required'}, 403
 
             amenity_data = api.payload
             existing_amenity = facade.get_amenity_by_name(amenity_data['name'])
             if existing_amenity:
                 return {'error': 'This amenity already exist'}, 400
-            new_amenity = facade.create_amenity(amenity_data)
+            try:
+                new_amenity = facade.create_amenity(amenity_data)
+            except IntegrityError:
+                db.session.rollback()
+                return {'error': 'This amenity already exist'}, 400
 
             return {'id': new_amenity.id, 'name': new_amenity.name}, 201
 
@@ -178,8 +205,7 @@ class AmenityResource(Resource):
             If the input data is invalid, returns a 400 error.
         """
 
-            additionnal_claim = get_jwt()
-            if not additionnal_claim["is_admin"]:
+            if not get_current_user().is_admin:
                 return {'error': 'Admin privileges required'}, 403
 
             amenity = facade.get_amenity(amenity_id)
@@ -200,5 +226,9 @@ class AmenityResource(Resource):
                 facade.update_amenity(amenity_id, update_data)
             except ValueError:
                 return {'error': 'Invalid input data'}, 400
+            except IntegrityError:
+                # Another amenity took the name meanwhile
+                db.session.rollback()
+                return {'error': 'This amenity already exist'}, 400
 
             return {"message": "Amenity updated successfully"}
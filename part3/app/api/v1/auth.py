@@ -1,5 +1,9 @@
+from math import ceil
+from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import create_access_token
+from app import login_limiter
+from app.hashing import HashingBusyError
 from app.services import facade
 
 api = Namespace('auth', description='Authentication operations')
@@ -19,12 +23,24 @@ class Login(Resource):
         credentials = api.payload
         # Get the email and password from the request payload
 
+        # Step 0: Reject the attempts over the limit before any lookup
+        wait = login_limiter.hit(credentials['email'], request.remote_addr)
+        if wait:
+            return {'error': 'Too many login attempts'}, 429, {
+                'Retry-After': str(ceil(wait))}
+
         # Step 1: Retrieve the user based on the provided email
         user = facade.get_user_by_email(credentials['email'])
 
         # Step 2: Check if the user exists and the password is correct
-        if not user or not user.verify_password(credentials['password']):
-            return {'error': 'Invalid credentials'}, 401
+        try:
+            if not user or not user.verify_password(credentials['password']):
+                return {'error': 'Invalid credentials'}, 401
+        except HashingBusyError:
+            return {'error': 'Server busy, retry later'}, 503, {
+                'Retry-After': '1'}
+
+        login_limiter.succeeded(credentials['email'])
 
         # Step 3: Create a JWT token with the user's id and is_admin flag
         access_token = create_access_token(
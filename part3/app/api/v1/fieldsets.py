@@ -0,0 +1,60 @@
+"""Sparse fieldsets of the list endpoints.
+
+A list endpoint accepts a `fields` parameter (`?fields=id,title`) to
+return only some fields of each item. Every field is read from known
+columns, so the repositories select these columns only, as plain rows,
+instead of loading and hydrating whole objects.
+"""
+from flask import request
+
+
+class Fieldset:
+    """Fields a list endpoint can return and the columns they are read from.
+
+    Attributes:
+        fields (dict): Field name -> column name, or (tuple of column
+            names, function computing the field from their values).
+        default (tuple): Fields returned when none are requested.
+    """
+
+    def __init__(self, fields, default):
+        self.fields = fields
+        self.default = tuple(default)
+
+    def requested(self):
+        """Return the fields asked by the `fields` parameter of the request.
+
+        Raises:
+            ValueError: If a field is unknown or none is given.
+        """
+        value = request.args.get('fields')
+        if value is None:
+            return list(self.default)
+        names = list(dict.fromkeys(
+            name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ValueError('Unknown fields: ' + ', '.join(unknown)
+                             if unknown else 'No field requested')
+        return names
+
+    def _spec(self, name):
+        """Return the columns and the value function of a field."""
+        spec = self.fields[name]
+        if isinstance(spec, str):
+            return (spec,), None
+        return spec
+
+    def columns(self, names):
+        """Return the columns to select to build the given fields."""
+        return list(dict.fromkeys(
+            column for name in names for column in self._spec(name)[0]))
+
+    def serialize(self, row, names):
+        """Return the given fields of a row as a dictionary."""
+        result = {}
+        for name in names:
+            columns, function = self._spec(name)
+            values = [getattr(row, column) for column in columns]
+            result[name] = function(*values) if function else values[0]
+        return result
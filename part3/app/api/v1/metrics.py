@@ -0,0 +1,147 @@
+from flask import current_app
+from flask_restx import Namespace, Resource
+from flask_jwt_extended import jwt_required, get_current_user
+from app import email_checker, login_limiter, password_hasher
+from app.services import facade
+
+api = Namespace('metrics', description='Monitoring operations')
+
+
+@api.route('/')
+class SQLMetrics(Resource):
+    """Resource exposing the SQL statistics aggregated per endpoint."""
+
+    @api.response(200, 'Metrics retrieved successfully')
+    @api.response(403, 'Admin privileges required')
+    @api.response(404, 'Instrumentation disabled')
+    @jwt_required()
+    def get(self):
+        """
+        Retrieve the SQL statistics of each endpoint, admins only.
+
+        Returns:
+            list: A JSON object keyed by endpoint, each giving the number of
+            requests, the total, average and maximum number of statements
+            per request, the time spent in the database and the slowest
+            statement, with a 200 status code.
+            If the user is not an admin, returns a 403 error.
+        """
+        if not get_current_user().is_admin:
+            return {'error': 'Admin privileges required'}, 403
+
+        metrics = current_app.extensions.get('sql_instrumentation')
+        if metrics is None:
+            return {'error': 'SQL instrumentation is disabled'}, 404
+        return metrics.snapshot(), 200
+
+    @api.response(200, 'Metrics reset successfully')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def delete(self):
+        """
+        Reset the SQL statistics, admins only.
+
+        Returns:
+            list: A success message with a 200 status code.
+            If the user is not an admin, returns a 403 error.
+        """
+        if not get_current_user().is_admin:
+            return {'error': 'Admin privileges required'}, 403
+
+        metrics = current_app.extensions.get('sql_instrumentation')
+        if metrics is not None:
+            metrics.reset()
+        return {'message': 'Metrics reset successfully'}, 200
+
+
+@api.route('/cache')
+class CacheMetrics(Resource):
+    """Resource exposing the counters of the entity caches."""
+
+    @api.response(200, 'Metrics retrieved successfully')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def get(self):
+        """
+        Retrieve the size and hit/miss counters of each entity cache,
+        admins only.
+
+        Returns:
+            list: A JSON object keyed by entity with a 200 status code.
+            If the user is not an admin, returns a 403 error.
+        """
+        if not get_current_user().is_admin:
+            return {'error': 'Admin privileges required'}, 403
+
+        return facade.get_cache_stats(), 200
+
+
+@api.route('/hashing')
+class HashingMetrics(Resource):
+    """Resource exposing the state of the password hashing pool."""
+
+    @api.response(200, 'Metrics retrieved successfully')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def get(self):
+        """
+        Retrieve the queue depth and counters of the password hashing pool,
+        admins only.
+
+        Returns:
+            list: A JSON object with the bcrypt cost, the number of
+            workers, the operations pending, completed and rejected, with
+            a 200 status code.
+            If the user is not an admin, returns a 403 error.
+        """
+        if not get_current_user().is_admin:
+            return {'error': 'Admin privileges required'}, 403
+
+        return password_hasher.stats(), 200
+
+
+@api.route('/login')
+class LoginMetrics(Resource):
+    """Resource exposing the counters of the login rate limiter."""
+
+    @api.response(200, 'Metrics retrieved successfully')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def get(self):
+        """
+        Retrieve the login attempts allowed and rejected, admins only.
+
+        Returns:
+            list: A JSON object with the attempts allowed, the attempts
+            rejected by scope (email, ip), the number of buckets stored
+            and the limits, with a 200 status code.
+            If the user is not an admin, returns a 403 error.
+        """
+        if not get_current_user().is_admin:
+            return {'error': 'Admin privileges required'}, 403
+
+        return login_limiter.stats(), 200
+
+
+@api.route('/email')
+class EmailMetrics(Resource):
+    """Resource exposing the counters of the email domain checks."""
+
+    @api.response(200, 'Metrics retrieved successfully')
+    @api.response(403, 'Admin privileges required')
+    @jwt_required()
+    def get(self):
+        """
+        Retrieve the state of the email deliverability checks, admins only.
+
+        Returns:
+            list: A JSON object with the domains waiting for a check, the
+            checks done, the domains found undeliverable, the checks
+            dropped and the counters of the domain cache, with a 200
+            status code.
+            If the user is not an admin, returns a 403 error.
+        """
+        if not get_current_user().is_admin:
+            return {'error': 'Admin privileges required'}, 403
+
+        return email_checker.stats(), 200
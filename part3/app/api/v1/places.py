@@ -1,7 +1,12 @@
+from flask import current_app, request
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import jwt_required
+from flask_jwt_extended import get_current_user
+from sqlalchemy.exc import IntegrityError
 from app import db
+from app.api.v1.fieldsets import Fieldset
+from app.models.place import Place
 
 api = Namespace('places', description='Place operations')
 
@@ -35,6 +40,32 @@ place_model = api.model('Place', {
                              description="List of amenities ID's")
 })
 
+# Fields of the place list, read from the columns of the places only
+place_fields = Fieldset({
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'price': 'price',
+    'latitude': 'latitude',
+    'longitude': 'longitude',
+    'owner_id': 'user_id',
+    'rating': (('review_count', 'rating_sum'), Place.average_rating),
+    'review_count': 'review_count',
+}, default=('id', 'title', 'latitude', 'longitude', 'rating',
+            'review_count'))
+
+
+def _is_owner(place_id):
+    """Check whether the current user owns a place.
+
+    The cached principal answers for the places it knows. A place created
+    since it was cached, possibly by another process, is checked with a
+    query on the foreign key only.
+    """
+    principal = get_current_user()
+    return (principal.owns(place_id) or
+            facade.is_place_owner(place_id, principal.id))
+
 
 @api.route('/')
 class PlaceList(Resource):
@@ -69,27 +100,26 @@ class PlaceList(Resource):
         if existing_place is True:
             return {'error': 'This place already exists'}, 400
 
-        current_user = get_jwt_identity()
-        user = facade.get_user(current_user)
-        place_data['user'] = user
+        place_data['user_id'] = get_current_user().id
         amenities = place_data.get('amenities')
 
-        # Getting each amenity object by their name, to put in the list
+        # Getting all the amenity objects by their name, to put in the list
         if amenities:
             if type(amenities) is not list:
                 raise ValueError('error, amenities should be a list')
-            list_amenities = []
-            for amenity_name in place_data['amenities']:
-                new_amenity = facade.get_amenity_by_name(amenity_name)
-                if not new_amenity:
-                    return {'error': 'One amenity not found'}, 404
-                list_amenities.append(new_amenity)
-            place_data['amenities'] = list_amenities
+            found_amenities = facade.get_amenities_by_names(amenities)
+            if len(found_amenities) != len(set(amenities)):
+                return {'error': 'One amenity not found'}, 404
+            place_data['amenities'] = list(found_amenities.values())
 
         try:
             new_place = facade.create_place(place_data)
         except (ValueError, TypeError):
             return {'error': 'Invalid input data'}, 400
+        except IntegrityError:
+            # Another place was created at the same coordinates meanwhile
+            db.session.rollback()
+            return {'error': 'This place already exists'}, 400
 
         return {'id': new_place.id,
                 'title': new_place.title,
@@ -97,26 +127,195 @@ class PlaceList(Resource):
                 'price': new_place.price,
                 'latitude': new_place.latitude,
                 'longitude': new_place.longitude,
-                'owner_id': new_place.user.id}, 201
+                'owner_id': new_place.user_id}, 201
+
+    @api.param('limit', 'Maximum number of places to return', type=int)
+    @api.param('cursor', 'Cursor returned with the previous page')
+    @api.param('fields', 'Comma separated fields to return')
+    @api.param('min_price', 'Lowest price per night', type=float)
+    @api.param('max_price', 'Highest price per night', type=float)
+    @api.param('amenities', 'Comma separated names of required amenities')
+    @api.param('sort', 'created_at, price or rating, prefixed with - '
+               'for the descending order')
+    @api.response(200, 'List of places retrieved successfully')
+    @api.response(400, 'Invalid pagination, filter or sort parameters')
+    def get(self):
+        """
+        Retrieve a page of registered places.
+
+        Places are returned in creation order. To get the following page,
+        send back the `next_cursor` value as the `cursor` parameter; it is
+        null on the last page. The `fields` parameter selects the fields
+        of each place, among those listed below and the description,
+        price and owner_id.
+
+        The places can be filtered on their price and on the amenities
+        they all have, and sorted on their creation date, price or
+        rating. The cursor is only valid with the same filters and sort.
+
+        Returns:
+            list: A JSON object with a `places` list, each including their
+            ID, title, latitude, longitude, average rating and number of
+            reviews, and a `next_cursor`, along with a 200 status code.
+            If the limit, the cursor, a filter, the sort or a field is
+            invalid, returns a 400 error.
+        """
+        limit = request.args.get('limit', current_app.config['PAGE_SIZE'],
+                                 type=int)
+        if limit < 1:
+            return {'error': 'limit must be a positive integer'}, 400
+        limit = min(limit, current_app.config['MAX_PAGE_SIZE'])
+        try:
+            names = place_fields.requested()
+        except ValueError as error:
+            return {'error': str(error)}, 400
+
+        filters = {}
+        for name in ('min_price', 'max_price'):
+            if name in request.args:
+                try:
+                    filters[name] = float(request.args[name])
+                except ValueError:
+                    return {'error': f'{name} must be a number'}, 400
+        if request.args.get('amenities'):
+            filters['amenities'] = [
+                name.strip() for name in request.args['amenities'].split(',')
+                if name.strip()]
+        sort = request.args.get('sort', 'created_at')
+        if sort.lstrip('-') not in ('created_at', 'price', 'rating'):
+            return {'error': 'sort must be created_at, price or rating'}, 400
+
+        try:
+            places, next_cursor = facade.get_places_page(
+                limit, request.args.get('cursor'),
+                columns=place_fields.columns(names), sort=sort, **filters)
+        except ValueError:
+            return {'error': 'Invalid cursor'}, 400
+
+        place_list = [place_fields.serialize(place, names)
+                      for place in places]
+
+        return {'places': place_list, 'next_cursor': next_cursor}, 200
 
+
+@api.route('/bulk')
+class PlaceBulkImport(Resource):
+    """Resource for creating many places from an NDJSON body."""
+
+    @api.param('chunk_size', 'Number of places inserted per transaction',
+               type=int)
+    @api.response(200, 'Import done, see the report for rejected rows')
+    @api.response(400, 'Invalid chunk size')
+    @jwt_required()
+    def post(self):
+        """
+        Register many places at once.
+
+        The body is NDJSON: one JSON object per line, with the same fields
+        as a single place creation. Places belong to the current user;
+        admins may give another `owner_id` per row. Invalid rows are
+        skipped and reported, the other rows are created.
+
+        Returns:
+            list: A JSON report with the number of places created, the
+            number of rejected rows and, for each of them, its line number
+            and the reason, along with a 200 status code.
+        """
+        chunk_size = request.args.get(
+            'chunk_size', current_app.config['BULK_IMPORT_CHUNK_SIZE'],
+            type=int)
+        if chunk_size < 1:
+            return {'error': 'chunk_size must be a positive integer'}, 400
+
+        principal = get_current_user()
+        report = facade.bulk_import('places', request.stream, chunk_size,
+                                    owner=principal,
+                                    allow_owner_id=principal.is_admin)
+        return report.to_dict(), 200
+
+
+@api.route('/search')
+class PlaceSearch(Resource):
+    """Resource for searching places by keywords or around a location."""
+
+    @api.param('q', 'Words the title or description must all contain')
+    @api.param('lat', 'Latitude of the center of the search', type=float)
+    @api.param('lon', 'Longitude of the center of the search', type=float)
+    @api.param('radius_km', 'Radius of the search in kilometers',
+               type=float)
+    @api.param('limit', 'Maximum number of places to return', type=int)
     @api.response(200, 'List of places retrieved successfully')
+    @api.response(400, 'Invalid search parameters')
     def get(self):
         """
-        Retrieve a list of all registered places.
+        Retrieve the places matching words, or located around a point.
+
+        With `q`, the places whose title or description contains every
+        word are ranked by relevance, best first. With `lat`, `lon` and
+        `radius_km`, the places around the point are returned nearest
+        first; with both, the matches are searched around the point only.
 
         Returns:
-            list: A JSON list of all places, each including their ID, title,
-            latitude, and longitude, along with a 200 status code.
+            list: A JSON object with a `places` list, each including their
+            ID, title, latitude, longitude, and their relevance `score`
+            and/or their distance in kilometers, along with a 200 status
+            code.
+            If a parameter is missing or invalid, returns a 400 error.
         """
-        places = facade.get_all_places()
-        place_list = [{
+        text = request.args.get('q', '').strip()
+        latitude = request.args.get('lat', type=float)
+        longitude = request.args.get('lon', type=float)
+        radius_km = request.args.get('radius_km', type=float)
+        limit = request.args.get('limit', current_app.config['PAGE_SIZE'],
+                                 type=int)
+        located = any(name in request.args
+                      for name in ('lat', 'lon', 'radius_km'))
+        if limit < 1:
+            return {'error': 'limit must be a positive integer'}, 400
+        limit = min(limit, current_app.config['MAX_PAGE_SIZE'])
+        if text and not located:
+            return {'places': [
+                self._place(place, score=score) for place, score
+                in facade.search_places_text(text, limit)]}, 200
+
+        if latitude is None or longitude is None or radius_km is None:
+            return {'error': 'q, or lat, lon and radius_km are required'}, 400
+        if latitude > 90 or latitude < -90:
+            return {'error': 'Latitude must be between 90 and -90'}, 400
+        if longitude > 180 or longitude < -180:
+            return {'error': 'Longitude must be between 180 and -180'}, 400
+        if (radius_km <= 0 or
+                radius_km > current_app.config['MAX_SEARCH_RADIUS_KM']):
+            return {'error': 'radius_km is out of range'}, 400
+
+        results = facade.search_places_nearby(latitude, longitude, radius_km)
+        if text:
+            distances = {place.id: distance for place, distance in results}
+            place_list = [
+                self._place(place, score=score,
+                            distance=distances[place.id])
+                for place, score in facade.search_places_text(
+                    text, limit, place_ids=distances)]
+        else:
+            place_list = [self._place(place, distance=distance)
+                          for place, distance in results[:limit]]
+
+        return {'places': place_list}, 200
+
+    @staticmethod
+    def _place(place, score=None, distance=None):
+        """Return the fields of a search result."""
+        result = {
             'id': place.id,
             'title': place.title,
             'latitude': place.latitude,
-            'longitude': place.longitude,
-        } for place in places]
-
-        return place_list, 200
+            'longitude': place.longitude
+        }
+        if score is not None:
+            result['score'] = score
+        if distance is not None:
+            result['distance_km'] = round(distance, 3)
+        return result
 
 
 @api.route('/<place_id>')
@@ -134,11 +333,11 @@ class PlaceResource(Resource):
 
         Returns:
             list: A JSON object containing full details of the place,
-            including owner information and amenities,
+            including owner information, amenities and average rating,
                 along with a 200 status code.
             If the place is not found, returns a 404 error.
         """
-        place = facade.get_place(place_id)
+        place = facade.get_place_details(place_id)
         if not place:
             return {'error': 'Place not found'}, 404
 
@@ -162,7 +361,9 @@ class PlaceResource(Resource):
                 "last_name": place.user.last_name,
                 "email": place.user.email
             },
-            'amenities': list_amenities
+            'amenities': list_amenities,
+            'rating': place.rating,
+            'review_count': place.review_count
         }, 200
 
     @api.response(404, 'Place not found')
@@ -189,8 +390,7 @@ class PlaceResource(Resource):
         if not place:
             return {'error': 'Place not found'}, 404
 
-        current_user = get_jwt_identity()
-        if current_user != place.user.id:
+        if not _is_owner(place.id):
             return {'error': 'Unauthorized action'}, 403
 
         data_amenity = api.payload
@@ -200,10 +400,10 @@ class PlaceResource(Resource):
         if type(new_amenities) is not list:
             return {"error": "amenities must be a list"}
 
-        for name_amenity in data_amenity['amenities']:
-            amenity = facade.get_amenity_by_name(name_amenity)
-            if not amenity:
-                return {'error': 'Amenity not found'}, 404
+        found_amenities = facade.get_amenities_by_names(new_amenities)
+        if len(found_amenities) != len(set(new_amenities)):
+            return {'error': 'Amenity not found'}, 404
+        for amenity in found_amenities.values():
             place.amenities.append(amenity)
             list_new_amenities.append({'id': amenity.id,
                                        'name': amenity.name})
@@ -240,11 +440,10 @@ class PlaceResource(Resource):
         if not place:
             return {'error': 'Place not found'}, 404
 
-        current_user = get_jwt_identity()
         data_place = api.payload
         data_amenities = data_place.get('amenities')
 
-        if current_user != place.user.id:
+        if not _is_owner(place.id):
             return {'error': 'Unauthorized action'}, 403
         for key in data_place:
             if key == 'owner_id' or key == 'id':
@@ -256,18 +455,19 @@ class PlaceResource(Resource):
         if data_amenities:
             if type(data_amenities) is not list:
                 return {'error': 'amenities must be a list'}, 400
-            list_amenities = []
-            for amenity_name in data_amenities:
-                new_amenity = facade.get_amenity_by_name(amenity_name)
-                if not new_amenity:
-                    return {'error': 'One amenity not found'}, 404
-                list_amenities.append(new_amenity)
-            data_place['amenities'] = list_amenities
+            found_amenities = facade.get_amenities_by_names(data_amenities)
+            if len(found_amenities) != len(set(data_amenities)):
+                return {'error': 'One amenity not found'}, 404
+            data_place['amenities'] = list(found_amenities.values())
 
         try:
             facade.update_place(place_id, data_place)
         except ValueError:
             return {'error': 'Invalid input data'}, 400
+        except IntegrityError:
+            db.session.rollback()
+            return {'error': 'A place already exists at these coordinates'
+                    }, 400
 
         return {"message": "Place updated successfully"}, 200
 
@@ -300,16 +500,10 @@ class AdminPlaceModify(Resource):
             If the input data is invalid, returns a 400 error.
         """
 
-        current_user = get_jwt_identity()
-        additionnal_claim = get_jwt()
-
-        # Set is_admin default to False if not exists
-        is_admin = additionnal_claim["is_admin"]
-
         place = facade.get_place(place_id)
         if not place:
             return {'error': 'place not found'}, 404
-        if not is_admin:
+        if not get_current_user().is_admin:
             return {'error': 'Unauthorized action'}, 403
 
         data_place = api.payload
@@ -322,17 +516,18 @@ class AdminPlaceModify(Resource):
 
         data_amenities = data_place.get(("amenities"))
         if data_amenities:
-            list_amenities = []
-            for amenity_name in data_amenities:
-                new_amenity = facade.get_amenity_by_name(amenity_name)
-                if not new_amenity:
-                    return {'error': 'One amenity not found'}, 404
-                list_amenities.append(new_amenity)
-            data_place['amenities'] = list_amenities
+            found_amenities = facade.get_amenities_by_names(data_amenities)
+            if len(found_amenities) != len(set(data_amenities)):
+                return {'error': 'One amenity not found'}, 404
+            data_place['amenities'] = list(found_amenities.values())
 
         try:
             facade.update_place(place_id, data_place)
         except ValueError:
             return {'error': 'Invalid input data'}, 400
+        except IntegrityError:
+            db.session.rollback()
+            return {'error': 'A place already exists at these coordinates'
+                    }, 400
 
         return {"message": "Place updated successfully"}, 200
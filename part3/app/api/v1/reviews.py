@@ -1,6 +1,9 @@
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
+from flask_jwt_extended import get_current_user
+from sqlalchemy.exc import IntegrityError
 from app.services import facade
+from app.api.v1.fieldsets import Fieldset
 
 api = Namespace('reviews', description='Review operations')
 
@@ -16,6 +19,15 @@ review_model = api.model('Review', {
     (required=True, description='ID of the place')
 })
 
+# Fields of the review list, the ids are read from the foreign keys
+review_fields = Fieldset({
+    'id': 'id',
+    'text': 'text',
+    'rating': 'rating',
+    'user_id': 'user_id',
+    'place_id': 'place_id',
+}, default=('id', 'text', 'rating', 'user_id', 'place_id'))
+
 
 @api.route('/')
 class ReviewList(Resource):
@@ -47,51 +59,60 @@ class ReviewList(Resource):
         if not existing_place:
             return {'error': 'This place doesn\'t exist'}, 404
 
-        current_user = get_jwt_identity()
-        user = facade.get_user(current_user)
-
-        review_data['user'] = user
-
-        if current_user == existing_place.user.id:
+        principal = get_current_user()
+        review_data['user_id'] = principal.id
+        if (principal.owns(existing_place.id) or
+                facade.is_place_owner(existing_place.id, principal.id)):
             return {"message": "You cannot review your own place."}, 400
 
-        for existing_review in existing_place.reviews:
-            if current_user == existing_review.user.id:
-                return {
-                    "message": "You have already reviewed this place."
-                }, 400
+        if facade.has_reviewed(principal.id, existing_place.id):
+            return {
+                "message": "You have already reviewed this place."
+            }, 400
         review_data['place'] = existing_place
         review_data.pop('place_id')
         try:
             review = facade.create_review(review_data)
         except ValueError:
             return {'error': 'Invalid input data'}, 400
+        except IntegrityError:
+            # The same review was posted concurrently, the transaction
+            # has been rolled back
+            return {
+                "message": "You have already reviewed this place."
+            }, 400
 
         return {
             'id': review.id,
             'text': review.text,
             'rating': review.rating,
-            'user_id': review.user.id,
+            'user_id': review.user_id,
             'place_id': review.place.id
         }, 201
 
+    @api.param('fields', 'Comma separated fields to return')
     @api.response(200, 'List of reviews retrieved successfully')
+    @api.response(400, 'Unknown field')
     def get(self):
         """
         Retrieve a list of all reviews.
 
+        The `fields` parameter selects the fields of each review.
+
         Returns:
             list: A JSON list of all reviews, each containing ID, text, rating,
             user_id, and place_id, with a 200 status code.
+            If a field is unknown, returns a 400 error.
         """
-        reviews = facade.get_all_reviews()
-        review_list = [{
-            'id': review.id,
-            'text': review.text,
-            'rating': review.rating,
-            'user_id': review.user.id,
-            'place_id': review.place.id
-        } for review in reviews]
+        try:
+            names = review_fields.requested()
+        except ValueError as error:
+            return {'error': str(error)}, 400
+
+        reviews = facade.get_all_reviews(
+            columns=review_fields.columns(names))
+        review_list = [review_fields.serialize(review, names)
+                       for review in reviews]
 
         return review_list, 200
 
@@ -166,8 +187,7 @@ class ReviewResource(Resource):
                     return {'error: You cannot modify the objects link to the'
                             'review.'}, 403
 
-        current_user = get_jwt_identity()
-        if current_user != review.user.id:
+        if not facade.is_review_author(review_id, get_current_user().id):
             return {"error": "Unauthorized action."}, 403
 
         try:
@@ -200,8 +220,7 @@ class ReviewResource(Resource):
         if not review:
             return {'error': 'Review not found'}, 404
 
-        current_user = get_jwt_identity()
-        if current_user != review.user_id:
+        if not facade.is_review_author(review_id, get_current_user().id):
             return {"error": "Unauthorized action."}, 403
 
         review = facade.delete_review(review_id)
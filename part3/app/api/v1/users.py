@@ -1,7 +1,9 @@
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import jwt_required, get_current_user
 from flask import request
+from app.hashing import HashingBusyError
+from app.api.v1.fieldsets import Fieldset
 
 
 api = Namespace('users', description='User operations')
@@ -16,6 +18,15 @@ user_model = api.model('User', {
                            description='Email of the user')
 })
 
+# Fields of the user list; the password is never one of them
+user_fields = Fieldset({
+    'id': 'id',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'email': 'email',
+    'is_admin': 'is_admin',
+}, default=('id', 'first_name', 'last_name', 'email'))
+
 
 @api.route('/')
 class UserList(Resource):
@@ -50,26 +61,35 @@ class UserList(Resource):
             new_user = facade.create_user(user_data)
         except ValueError:
             return {'error': 'Invalid input data'}, 400
+        except HashingBusyError:
+            return {'error': 'Server busy, retry later'}, 503, {
+                'Retry-After': '1'}
 
         return {'id': new_user.id,
                 'Success': 'User created successfully !'}, 201
 
+    @api.param('fields', 'Comma separated fields to return')
     @api.response(200, 'List of users retrieved successfully')
+    @api.response(400, 'Unknown field')
     def get(self):
         """
         Retrieve the list of all registered users.
 
+        The `fields` parameter selects the fields of each user, among
+        those listed below and is_admin.
+
         Returns:
             list: A JSON list of all users, each containing ID, first name,
             last name, and email, along with a 200 status code.
+            If a field is unknown, returns a 400 error.
         """
-        users = facade.get_all_users()
-        user_list = [{
-            'id': user.id,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'email': user.email
-        } for user in users]
+        try:
+            names = user_fields.requested()
+        except ValueError as error:
+            return {'error': str(error)}, 400
+
+        users = facade.get_all_users(columns=user_fields.columns(names))
+        user_list = [user_fields.serialize(user, names) for user in users]
 
         return user_list, 200
 
@@ -129,8 +149,7 @@ class UserResource(Resource):
             return {'error': 'User not found'}, 404
 
         update_data = api.payload
-        current_user = get_jwt_identity()
-        if current_user != user_id:
+        if get_current_user().id != user_id:
             return {
                 "error": "Unauthorized action."
             }, 403
@@ -179,8 +198,7 @@ class AdminUserCreate(Resource):
             403 - If the user is not an admin
         """
 
-        additionnal_claim = get_jwt()
-        if not additionnal_claim["is_admin"]:
+        if not get_current_user().is_admin:
             return {'error': 'Admin privileges required'}, 403
 
         user_data = api.payload
@@ -195,6 +213,9 @@ class AdminUserCreate(Resource):
             new_user = facade.create_user(user_data)
         except ValueError:
             return {'error': 'Invalid input data'}, 400
+        except HashingBusyError:
+            return {'error': 'Server busy, retry later'}, 503, {
+                'Retry-After': '1'}
 
         return {'id': new_user.id,
                 'Success': 'User created successfully !'}, 201
@@ -224,9 +245,7 @@ class AdminUserResource(Resource):
             404 - If the user is not found.
         """
 
-        # If 'is_admin' is part of the identity payload
-        additionnal_claim = get_jwt()
-        if not additionnal_claim["is_admin"]:
+        if not get_current_user().is_admin:
             return {'error': 'Admin privileges required'}, 403
 
         update_data = request.json
@@ -243,7 +262,13 @@ class AdminUserResource(Resource):
             if existing_user and existing_user.id != user_id:
                 return {'error': 'Email is already in use'}, 400
         if password:
-            user.hash_password(password)
+            try:
+                user.hash_password(password)
+            except ValueError:
+                return {'error': 'Invalid input data'}, 400
+            except HashingBusyError:
+                return {'error': 'Server busy, retry later'}, 503, {
+                    'Retry-After': '1'}
             update_data.pop('password')
         try:
             facade.update_user(user_id, update_data)
@@ -0,0 +1,48 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app import db
+from app.models.place import search_index
+from app.services import facade
+from app.services.bulk_import import ENTITIES
+
+hbnb_cli = AppGroup('hbnb', help='HBnB administration commands.')
+
+
+@hbnb_cli.command('import')
+@click.argument('entity', type=click.Choice(ENTITIES))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--chunk-size', type=click.IntRange(min=1),
+              help='Number of rows inserted per transaction.')
+@click.option('--owner-email',
+              help='Owner of the places whose row has no owner_id.')
+def import_command(entity, source, chunk_size, owner_email):
+    """Load ENTITY rows from the NDJSON file SOURCE ('-' for stdin).
+
+    Invalid rows are reported on stderr and skipped; the command exits
+    with status 1 if any row was rejected.
+    """
+    owner = None
+    if owner_email:
+        owner = facade.get_user_by_email(owner_email)
+        if owner is None:
+            raise click.BadParameter('No user with this email',
+                                     param_hint='--owner-email')
+    if chunk_size is None:
+        chunk_size = current_app.config['BULK_IMPORT_CHUNK_SIZE']
+
+    report = facade.bulk_import(entity, source, chunk_size, owner=owner)
+    for error in report.errors:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"{report.created} {entity} created, "
+               f"{len(report.errors)} rejected")
+    if report.errors:
+        raise SystemExit(1)
+
+
+@hbnb_cli.command('reindex')
+def reindex_command():
+    """Rebuild the full-text index of the places, e.g. after a VACUUM."""
+    with db.engine.begin() as connection:
+        search_index.refill(connection)
+    click.echo("Full-text index of the places rebuilt")
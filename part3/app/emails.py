@@ -0,0 +1,191 @@
+"""Validation of the email addresses off the DNS.
+
+By default `email_validator` also checks that the domain of an address
+accepts mail, with DNS queries that take up to seconds on every signup
+and email change. Here the request path only checks the syntax; the
+domains are checked by worker threads, at most once per domain for a
+while, and a domain found undeliverable is rejected on the next request
+without a new query.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from email_validator import (EmailNotValidError, EmailUndeliverableError,
+                             validate_email)
+from email_validator.deliverability import validate_email_deliverability
+from flask import current_app
+from app.persistence.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+VALIDATION_MODES = ('syntax', 'background', 'dns')
+
+
+def _check_domain(domain, timeout):
+    """Return whether a domain accepts mail, or None if DNS did not tell.
+
+    Runs in a worker thread in the background mode.
+    """
+    try:
+        info = validate_email_deliverability(domain, domain, timeout=timeout)
+    except EmailUndeliverableError:
+        return False
+    return None if info.get('unknown-deliverability') else True
+
+
+class DeliverabilityChecker:
+    """Checks and caches whether the domains of the addresses accept mail.
+
+    Attributes:
+        cache (TTLCache): Result of the last check of each domain.
+        checked (int): Number of checks done.
+        undeliverable (int): Number of domains found undeliverable.
+        dropped (int): Number of checks skipped, the queue being full.
+    """
+
+    def __init__(self, cache, workers=2, max_pending=256, timeout=5,
+                 check=_check_domain):
+        """Initialize the checker, the threads start on first use.
+
+        Args:
+            cache (TTLCache): Cache of the results per domain.
+            workers (int): Number of worker threads.
+            max_pending (int): Maximum number of domains waiting for a
+                check; the others are checked when seen again.
+            timeout (float): Timeout of the DNS queries in seconds.
+            check (callable): Checks a domain, replaceable in tests.
+        """
+        self.cache = cache
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.checked = 0
+        self.undeliverable = 0
+        self.dropped = 0
+        self._check = check
+        self._pending = set()
+        self._lock = Lock()
+        self._executor = None
+
+    def result(self, domain):
+        """Return the cached result of a domain, None if unknown."""
+        return self.cache.get(domain)
+
+    def check(self, domain):
+        """Check a domain in the calling thread and cache the result."""
+        deliverable = self._check(domain, self.timeout)
+        with self._lock:
+            self.checked += 1
+            if deliverable is False:
+                self.undeliverable += 1
+        if deliverable is not None:
+            self.cache.set(domain, deliverable)
+        return deliverable
+
+    def submit(self, domain):
+        """Check a domain in a worker thread, unless already waiting."""
+        with self._lock:
+            if domain in self._pending:
+                return
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.add(domain)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self.workers, thread_name_prefix='email-check')
+            self._executor.submit(self._run, domain)
+
+    def _run(self, domain):
+        """Check a domain in a worker thread."""
+        try:
+            if self.check(domain) is False:
+                logger.warning("Email domain %s does not accept mail",
+                               domain)
+        except Exception:
+            logger.exception("Checking the email domain %s failed", domain)
+        finally:
+            with self._lock:
+                self._pending.discard(domain)
+
+    def stats(self):
+        """Return the queue depth and counters of the checker."""
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'max_pending': self.max_pending,
+                'checked': self.checked,
+                'undeliverable': self.undeliverable,
+                'dropped': self.dropped,
+                'cache': self.cache.stats()
+            }
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+class EmailChecker:
+    """Flask extension validating the email addresses of the users.
+
+    Settings:
+        EMAIL_VALIDATION: 'syntax' to check the syntax only,
+            'background' to also check the domains in worker threads and
+            reject those found undeliverable, 'dns' to check the domain
+            before accepting an address.
+        EMAIL_DOMAIN_CACHE: `maxsize` and `ttl` of the cache of the
+            domain results.
+        EMAIL_CHECK_WORKERS: Number of worker threads.
+        EMAIL_CHECK_MAX_PENDING: Bound of the domains waiting for a check.
+        EMAIL_DNS_TIMEOUT: Timeout of the DNS queries in seconds.
+    """
+
+    def init_app(self, app):
+        """Create the deliverability checker of an application."""
+        mode = app.config.get('EMAIL_VALIDATION', 'syntax')
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Unknown EMAIL_VALIDATION mode: {mode}")
+        app.extensions['email_checker'] = DeliverabilityChecker(
+            TTLCache(**app.config.get('EMAIL_DOMAIN_CACHE', {})),
+            workers=app.config.get('EMAIL_CHECK_WORKERS', 2),
+            max_pending=app.config.get('EMAIL_CHECK_MAX_PENDING', 256),
+            timeout=app.config.get('EMAIL_DNS_TIMEOUT', 5))
+
+    @staticmethod
+    def _checker():
+        """Return the deliverability checker of the current application."""
+        return current_app.extensions['email_checker']
+
+    def validate(self, email):
+        """Check an email address and return its normalized form.
+
+        Raises:
+            ValueError: If the syntax is invalid, or the domain is known
+                not to accept mail.
+        """
+        try:
+            valid = validate_email(email, check_deliverability=False)
+        except EmailNotValidError:
+            raise ValueError("Invalid email address format")
+
+        mode = current_app.config.get('EMAIL_VALIDATION', 'syntax')
+        if mode == 'syntax':
+            return valid.normalized
+        checker = self._checker()
+        domain = valid.ascii_domain
+        deliverable = checker.result(domain)
+        if deliverable is None:
+            if mode == 'dns':
+                deliverable = checker.check(domain)
+            else:
+                checker.submit(domain)
+        if deliverable is False:
+            raise ValueError("Email domain does not accept mail")
+        return valid.normalized
+
+    def stats(self):
+        """Return the counters of the current app's checker."""
+        return self._checker().stats()
@@ -0,0 +1,204 @@
+"""Password hashing off the request threads.
+
+bcrypt is deliberately slow, so hashing and checking passwords run in a
+pool of worker processes: a login storm keeps all the cores busy instead
+of serializing on the interpreter lock of the Flask workers. The number
+of waiting operations is bounded; past the bound, callers get a
+HashingBusyError instead of queueing forever. They get it as well when a
+worker does not answer in time, or when the workers keep dying.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from threading import BoundedSemaphore, Lock
+import bcrypt
+from flask import current_app
+
+
+class HashingBusyError(Exception):
+    """Raised when too many password operations are already waiting."""
+
+
+def _hash_password(password, rounds):
+    """Hash a password with bcrypt (runs in a worker process)."""
+    salt = bcrypt.gensalt(rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def _check_password(hashed, password):
+    """Check a password against a bcrypt hash (runs in a worker process)."""
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'),
+                              hashed.encode('utf-8'))
+    except ValueError:
+        return False
+
+
+class HashingPool:
+    """Bounded pool running the bcrypt operations of one application.
+
+    With `workers` set to 0 the operations run in the calling thread,
+    still bounded by `max_pending`.
+    """
+
+    def __init__(self, rounds=12, workers=0, max_pending=64, timeout=30):
+        """Initialize the pool, the processes start on first use.
+
+        Args:
+            rounds (int): bcrypt cost factor (log2 of the iterations).
+            workers (int): Number of worker processes.
+            max_pending (int): Maximum number of operations running or
+                waiting for a worker.
+            timeout (float): Seconds a caller waits for a worker.
+        """
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._slots = BoundedSemaphore(max_pending)
+        self._lock = Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        """Start the worker processes if needed."""
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers do not inherit the locks held by the
+                # threads of the web server, unlike forked ones
+                context = multiprocessing.get_context('spawn')
+                self._executor = ProcessPoolExecutor(self.workers,
+                                                     mp_context=context)
+            return self._executor
+
+    def _discard(self, executor):
+        """Drop a broken executor, the next operation starts a new one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _run_in_worker(self, function, args):
+        """Run a function in a worker process and wait for its result.
+
+        A worker that died (killed, crashed) breaks its executor for good,
+        so the operation is retried once on new processes.
+
+        Raises:
+            HashingBusyError: If no result came within `timeout` seconds,
+                or the new processes broke as well.
+        """
+        for _ in range(2):
+            executor = self._get_executor()
+            try:
+                return executor.submit(function, *args).result(self.timeout)
+            except BrokenProcessPool:
+                self._discard(executor)
+            except FutureTimeoutError:
+                raise HashingBusyError("Password operation timed out")
+        raise HashingBusyError("Password worker processes keep dying")
+
+    def run(self, function, *args):
+        """Run a hashing function and wait for its result.
+
+        Raises:
+            HashingBusyError: If `max_pending` operations are waiting, or
+                the workers did not answer.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingBusyError("Too many password operations pending")
+        with self._lock:
+            self.pending += 1
+        succeeded = False
+        try:
+            if not self.workers:
+                result = function(*args)
+            else:
+                result = self._run_in_worker(function, args)
+            succeeded = True
+            return result
+        finally:
+            with self._lock:
+                self.pending -= 1
+                if succeeded:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+            self._slots.release()
+
+    def stats(self):
+        """Return the queue depth and counters of the pool."""
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'workers': self.workers,
+                'pending': self.pending,
+                'max_pending': self.max_pending,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected
+            }
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+
+class PasswordHasher:
+    """Flask extension hashing and checking passwords through a HashingPool.
+
+    Settings:
+        BCRYPT_LOG_ROUNDS: bcrypt cost factor.
+        PASSWORD_HASH_WORKERS: Number of worker processes, 0 to hash in
+            the request thread.
+        PASSWORD_HASH_MAX_PENDING: Bound of the waiting operations.
+        PASSWORD_HASH_TIMEOUT: Seconds to wait for a worker.
+    """
+
+    def init_app(self, app):
+        """Create the hashing pool of an application."""
+        app.extensions['password_hasher'] = HashingPool(
+            rounds=app.config.get('BCRYPT_LOG_ROUNDS', 12),
+            workers=app.config.get('PASSWORD_HASH_WORKERS', 0),
+            max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING', 64),
+            timeout=app.config.get('PASSWORD_HASH_TIMEOUT', 30))
+
+    @staticmethod
+    def _pool():
+        """Return the hashing pool of the current application."""
+        return current_app.extensions['password_hasher']
+
+    def hash(self, password):
+        """Hash a password.
+
+        Raises:
+            ValueError: If the password is empty or not a string.
+            HashingBusyError: If too many operations are waiting.
+        """
+        if not password or type(password) is not str:
+            raise ValueError("Password must be a non-empty string")
+        pool = self._pool()
+        return pool.run(_hash_password, password, pool.rounds)
+
+    def verify(self, hashed, password):
+        """Check a password against its hash.
+
+        Raises:
+            HashingBusyError: If too many operations are waiting.
+        """
+        if not hashed or not password or type(password) is not str:
+            return False
+        return self._pool().run(_check_password, hashed, password)
+
+    def stats(self):
+        """Return the queue depth and counters of the current app's pool."""
+        return self._pool().stats()
@@ -0,0 +1,154 @@
+"""Per-request SQL instrumentation.
+
+Counts the statements executed while serving each request and the time
+spent in the database, reports them in a `Server-Timing` response header
+and aggregates them per endpoint to spot N+1 regressions.
+"""
+from threading import Lock
+from time import perf_counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# Key of the requests matching no endpoint, whatever their path, so
+# scanning random URLs does not grow the totals
+UNMATCHED_ENDPOINT = '<unmatched>'
+
+
+class SQLInstrumentation:
+    """Flask extension hooking the SQLAlchemy cursor events.
+
+    Usage:
+        sql_metrics = SQLInstrumentation()
+        sql_metrics.init_app(app, db)
+    """
+
+    def init_app(self, app, db):
+        """Register the engine listeners and the request hooks on an app.
+
+        Does nothing when the `SQL_INSTRUMENTATION` setting is False.
+
+        Args:
+            app (Flask): The application to instrument.
+            db (SQLAlchemy): The database extension bound to the app.
+        """
+        if not app.config.get('SQL_INSTRUMENTATION', True):
+            return
+        app.extensions['sql_instrumentation'] = EndpointMetrics()
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute',
+                             self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute',
+                             self._after_cursor_execute)
+                event.listen(engine, 'handle_error', self._handle_error)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters,
+                               context, executemany):
+        """Remember when the statement was sent to the database."""
+        conn.info.setdefault('query_start', []).append(perf_counter())
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters,
+                              context, executemany):
+        """Add the statement duration to the stats of the current request."""
+        elapsed = perf_counter() - conn.info['query_start'].pop()
+        if has_request_context() and 'sql_stats' in g:
+            g.sql_stats.record(statement, elapsed)
+
+    @staticmethod
+    def _handle_error(exception_context):
+        """Drop the start time of a statement that failed."""
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_start'):
+            connection.info['query_start'].pop()
+
+    @staticmethod
+    def _before_request():
+        """Start counting the statements of a new request."""
+        g.sql_stats = RequestStats()
+
+    @staticmethod
+    def _after_request(response):
+        """Expose the request stats and add them to the endpoint totals."""
+        stats = g.pop('sql_stats', None) or RequestStats()
+        response.headers.add('Server-Timing', stats.server_timing())
+        metrics = current_app.extensions['sql_instrumentation']
+        metrics.record(request.endpoint or UNMATCHED_ENDPOINT, stats)
+        return response
+
+
+class RequestStats:
+    """Statements executed while serving a single request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_statement = None
+
+    def record(self, statement, elapsed):
+        """Account for one executed statement.
+
+        Args:
+            statement (str): The SQL sent to the database.
+            elapsed (float): Execution time in seconds.
+        """
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed >= self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_statement = statement
+
+    def server_timing(self):
+        """Format the stats as a `Server-Timing` header value."""
+        return (f'db;desc="{self.count} queries";'
+                f'dur={self.total_time * 1000:.3f}, '
+                f'db-slowest;dur={self.slowest_time * 1000:.3f}')
+
+
+class EndpointMetrics:
+    """Thread-safe SQL totals aggregated per endpoint."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, stats):
+        """Add the stats of one request to its endpoint totals."""
+        with self._lock:
+            totals = self._endpoints.setdefault(endpoint, {
+                'requests': 0,
+                'queries': 0,
+                'max_queries': 0,
+                'db_time_ms': 0.0,
+                'slowest_ms': 0.0,
+                'slowest_statement': None
+            })
+            totals['requests'] += 1
+            totals['queries'] += stats.count
+            totals['max_queries'] = max(totals['max_queries'], stats.count)
+            totals['db_time_ms'] += stats.total_time * 1000
+            if stats.slowest_time * 1000 > totals['slowest_ms']:
+                totals['slowest_ms'] = stats.slowest_time * 1000
+                totals['slowest_statement'] = stats.slowest_statement
+
+    def snapshot(self):
+        """Return a copy of the totals with per-request averages."""
+        with self._lock:
+            result = {}
+            for endpoint, totals in self._endpoints.items():
+                entry = dict(totals)
+                entry['avg_queries'] = totals['queries'] / totals['requests']
+                entry['avg_db_time_ms'] = (totals['db_time_ms'] /
+                                           totals['requests'])
+                result[endpoint] = entry
+            return result
+
+    def reset(self):
+        """Forget all recorded totals."""
+        with self._lock:
+            self._endpoints.clear()
@@ -1,14 +1,18 @@
 from app.models.basemodel import BaseModel as BaseModel
-from sqlalchemy import Column, Integer, String, ForeignKey
+from app.models.types import BinaryUUID
+from sqlalchemy import Column, ForeignKey
 from sqlalchemy.orm import validates
 from sqlalchemy.orm import relationship
 from app import db
 
 place_amenity = db.Table('place_amenity',
-                         Column('place_id', Integer, ForeignKey(
+                         Column('place_id', BinaryUUID, ForeignKey(
                              'places.id'), primary_key=True),
-                         Column('amenity_id', Integer, ForeignKey(
-                             'amenities.id'), primary_key=True)
+                         Column('amenity_id', BinaryUUID, ForeignKey(
+                             'amenities.id'), primary_key=True),
+                         # The primary key only serves lookups by place_id
+                         db.Index('ix_place_amenity_amenity_id',
+                                  'amenity_id')
                          )
 
 
@@ -22,8 +26,8 @@ class Amenity(BaseModel):
         name (str): The name of the amenity (e.g., "Wi-Fi", "Pool", "Parking").
     """
     __tablename__ = "amenities"
-    name = db.Column(db.String(50), nullable=False)
-    places = relationship('Place', secondary=place_amenity, lazy='subquery',
+    name = db.Column(db.String(50), nullable=False, unique=True, index=True)
+    places = relationship('Place', secondary=place_amenity, lazy=True,
                           backref=db.backref('amenities', lazy=True))
 
     def __init__(self, name):
@@ -1,5 +1,5 @@
 from app import db
-import uuid
+from app.models.types import BinaryUUID, uuid7
 from datetime import datetime
 
 
@@ -7,15 +7,16 @@ class BaseModel(db.Model):
     """Base model providing common attributes and methods for all entities.
 
     Attributes:
-        id (str): Unique identifier for the object (UUID4).
+        id (str): Unique identifier for the object (time-ordered UUID7,
+            stored in 16 bytes).
         created_at (datetime): Timestamp of creation.
         updated_at (datetime): Timestamp of the last modification.
     """
     __abstract__ = True
     # This ensures SQLAlchemy does not create a table for BaseModel
 
-    id = db.Column(db.String(36), primary_key=True,
-                   default=lambda: str(uuid.uuid4()))
+    id = db.Column(BinaryUUID, primary_key=True,
+                   default=lambda: str(uuid7()))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
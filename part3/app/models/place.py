@@ -1,4 +1,6 @@
 from app.models.basemodel import BaseModel
+from app.models.types import BinaryUUID
+from app.persistence import fulltext, geo
 from sqlalchemy import Column, Integer, String, ForeignKey
 from sqlalchemy.orm import validates
 from sqlalchemy.orm import relationship
@@ -17,34 +19,74 @@ class Place(BaseModel):
         price (float): Price per night (must be positive).
         latitude (float): Latitude coordinate (-90 to 90).
         longitude (float): Longitude coordinate (-180 to 180).
+        geohash (str): Geohash of the coordinates, used to index the
+            place by location.
         owner_id (str): ID of the user who owns the place.
+        review_count (int): Number of reviews of the place.
+        rating_sum (int): Sum of the ratings of the reviews of the place.
         reviews (list): List of reviews associated with the place.
         amenities (list): List of amenities associated with the place.
     """
     __tablename__ = 'places'
+    # Back the (created_at, id) and (price, id) keysets used to paginate
+    # place listings, and forbid two places at the same coordinates
+    __table_args__ = (
+        db.Index('ix_places_created_at_id', 'created_at', 'id'),
+        db.Index('ix_places_price_id', 'price', 'id'),
+        db.UniqueConstraint('latitude', 'longitude',
+                            name='uq_places_latitude_longitude'),
+    )
 
     title = db.Column(db.String(50), nullable=False)
     description = db.Column(db.String(250))
     price = db.Column(db.Float, nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    geohash = db.Column(db.String(12), index=True)
+    # Rating aggregates maintained by the facade on each review change
+    review_count = db.Column(db.Integer, nullable=False, default=0,
+                             server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0,
+                           server_default='0')
+    user_id = db.Column(BinaryUUID, db.ForeignKey('users.id'),
+                        nullable=False, index=True)
     reviews = relationship('Review', backref='place',
                            lazy=True, cascade=('all, delete'))
 
     def __init__(self, title, description, price, latitude, longitude,
-                 user, amenities=None):
-        """Initialize a new Place instance with validation."""
+                 user=None, amenities=None, user_id=None):
+        """Initialize a new Place instance with validation.
+
+        The owner is given as a User, or by its ID as `user_id` without
+        loading it.
+        """
         super().__init__()
         self.title = title
         self.description = description
         self.price = price
         self.latitude = latitude
         self.longitude = longitude
-        self.user = user
+        if user is not None:
+            self.user = user
+        else:
+            self.user_id = user_id
+        self.review_count = 0
+        self.rating_sum = 0
         if amenities:
             self.amenities = amenities
 
+    @property
+    def rating(self):
+        """Average rating of the place, or None if it has no review."""
+        return self.average_rating(self.review_count, self.rating_sum)
+
+    @staticmethod
+    def average_rating(review_count, rating_sum):
+        """Compute an average rating from the rating aggregates."""
+        if not review_count:
+            return None
+        return round(rating_sum / review_count, 2)
+
     @validates("title")
     def verify_title(self, key, value):
         """Set the title of the place.
@@ -91,6 +133,7 @@ class Place(BaseModel):
             raise TypeError("Latitude must be a number")
         elif value > 90 or value < -90:
             raise ValueError("Latitude must be between 90 and -90")
+        self._update_geohash(value, self.longitude)
         return value
 
     @validates("longitude")
@@ -108,4 +151,15 @@ class Place(BaseModel):
             raise TypeError("Longitude must be a number")
         elif value > 180 or value < -180:
             raise ValueError("Longitude must be between 180 and -180")
+        self._update_geohash(self.latitude, value)
         return value
+
+    def _update_geohash(self, latitude, longitude):
+        """Keep the geohash in sync with the coordinates once both are set."""
+        if latitude is not None and longitude is not None:
+            self.geohash = geo.encode(latitude, longitude)
+
+
+# Full-text index of the titles and descriptions, see PlaceRepository
+search_index = fulltext.FullTextIndex('places_fts', Place,
+                                      ('title', 'description'))
@@ -1,4 +1,5 @@
 from app.models.basemodel import BaseModel as BaseModel
+from app.models.types import BinaryUUID
 from sqlalchemy import Column, Integer, String, ForeignKey
 from sqlalchemy.orm import validates
 from app import db
@@ -7,6 +8,12 @@ from app import db
 class Review(BaseModel):
 
     __tablename__ = 'reviews'
+    __table_args__ = (
+        # A user reviews a place once; the index of the constraint also
+        # serves the lookups by user_id
+        db.UniqueConstraint('user_id', 'place_id',
+                            name='uq_reviews_user_id_place_id'),
+    )
 
     """Model representing a review made by a user for a place.
 
@@ -21,15 +28,19 @@ class Review(BaseModel):
     """
     text = db.Column(db.String(500))
     rating = db.Column(db.Integer, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    place_id = db.Column(db.Integer, db.ForeignKey(
-        'places.id'), nullable=False)
+    user_id = db.Column(BinaryUUID, db.ForeignKey('users.id'),
+                        nullable=False)
+    place_id = db.Column(BinaryUUID, db.ForeignKey('places.id'),
+                         nullable=False, index=True)
 
-    def __init__(self, text, rating, place, user):
+    def __init__(self, text, rating, place, user=None, user_id=None):
         super().__init__()
         self.text = text
         self.rating = rating
-        self.user = user
+        if user is not None:
+            self.user = user
+        else:
+            self.user_id = user_id
         self.place = place
 
     @validates("text")
@@ -0,0 +1,77 @@
+"""Column types and identifiers shared by the models."""
+import os
+import time
+import uuid
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import BINARY, LargeBinary, TypeDecorator
+
+
+def uuid7():
+    """Generate a time-ordered UUID (version 7, RFC 9562).
+
+    The first 48 bits are the Unix time in milliseconds, the rest is
+    random, so successive ids sort in creation order and new rows land at
+    the end of the primary key index instead of splitting random pages.
+
+    Returns:
+        uuid.UUID: The new UUID.
+    """
+    timestamp = time.time_ns() // 1_000_000
+    value = (timestamp & 0xFFFFFFFFFFFF) << 80
+    value |= int.from_bytes(os.urandom(10), 'big')
+    # Version (4 bits, 7) and variant (2 bits, 0b10)
+    value = value & ~(0xF << 76) | (0x7 << 76)
+    value = value & ~(0x3 << 62) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+
+def parse_uuid(value):
+    """Return a value as a UUID.
+
+    Returns:
+        uuid.UUID: The UUID, or None if the value is not a valid one.
+    """
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+class BinaryUUID(TypeDecorator):
+    """UUID stored in 16 bytes, exposed as its canonical string.
+
+    PostgreSQL stores it in its native UUID type, the other databases in
+    a 16-byte binary column (BLOB on SQLite), less than half the size of
+    the 36 characters of the string form in every index and foreign key.
+
+    A string that is not a valid UUID is bound as NULL, so looking it up
+    finds nothing instead of failing. Repositories check ids with
+    `parse_uuid` before querying them.
+    """
+
+    impl = BINARY(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=True))
+        if dialect.name == 'sqlite':
+            return dialect.type_descriptor(LargeBinary(16))
+        return dialect.type_descriptor(BINARY(16))
+
+    def process_bind_param(self, value, dialect):
+        value = None if value is None else parse_uuid(value)
+        if value is None:
+            return None
+        if dialect.name == 'postgresql':
+            return value
+        return value.bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        return str(uuid.UUID(bytes=bytes(value)))
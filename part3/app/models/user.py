@@ -1,8 +1,7 @@
 from app.models.basemodel import BaseModel as BaseModel
-from email_validator import validate_email, EmailNotValidError
 from sqlalchemy import Column, Integer, String, ForeignKey
 from sqlalchemy.orm import relationship
-from app import bcrypt, db
+from app import db, email_checker, password_hasher
 import uuid
 from sqlalchemy.orm import validates
 
@@ -42,33 +41,43 @@ class User(BaseModel):
         self.is_admin = False
 
     def hash_password(self, password):
-        """Hashes the password before storing it."""
-        self.password = bcrypt.generate_password_hash(password).decode('utf-8')
+        """Hashes the password before storing it.
+
+        The hash is computed by the password hashing pool, outside of the
+        request thread.
+
+        Raises:
+            ValueError: If the password is empty or not a string.
+            HashingBusyError: If too many hashes are already waiting.
+        """
+        self.password = password_hasher.hash(password)
         return self.password
 
     def verify_password(self, password):
-        """Verifies if the provided password matches the hashed password."""
-        return bcrypt.check_password_hash(self.password, password)
+        """Verifies if the provided password matches the hashed password.
+
+        Raises:
+            HashingBusyError: If too many checks are already waiting.
+        """
+        return password_hasher.verify(self.password, password)
 
     @validates("email")
     def verify_email(self, key, value):
         """Set the user's email address with validation.
 
+        Only the syntax is checked here, the domain depending on the
+        `EMAIL_VALIDATION` setting.
+
         Args:
             value (str): Email address.
 
         Raises:
-            ValueError: If the email is empty or has invalid format.
+            ValueError: If the email is empty or has invalid format, or
+                its domain is known not to accept mail.
         """
         if len(value) > 120:
             raise ValueError("Email adress too long")
-        try:
-            valid = validate_email(value)
-            email = valid.normalized
-        except EmailNotValidError:
-            raise ValueError("Invalid email address format")
-
-        return email
+        return email_checker.validate(value)
 
     @validates("first_name")
     def verify_first_name(self, key, value):
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+from flask import current_app
+
+
+def get_app_cache(name):
+    """Return the cache `name` of the current app.
+
+    The cache is created on first use from the `ENTITY_CACHE[name]`
+    setting (`maxsize`, `ttl`).
+
+    Returns:
+        TTLCache: The cache, or None if the setting is missing.
+    """
+    caches = current_app.extensions.setdefault('entity_cache', {})
+    if name not in caches:
+        options = current_app.config.get('ENTITY_CACHE', {}).get(name)
+        caches[name] = TTLCache(**options) if options else None
+    return caches[name]
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries also expire after a delay.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept.
+        ttl (float): Lifetime of an entry in seconds.
+        hits (int): Number of lookups answered from the cache.
+        misses (int): Number of lookups that found no fresh entry.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, clock=monotonic):
+        """Initialize an empty cache.
+
+        Args:
+            maxsize (int): Maximum number of entries kept.
+            ttl (float): Lifetime of an entry in seconds.
+            clock (callable): Time source, replaceable in tests.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Return the fresh value stored for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= self._clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entry if full."""
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """Remove the entry stored for `key` if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the size and hit/miss counters of the cache."""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses
+            }
@@ -0,0 +1,37 @@
+"""Per-connection settings of the database engines.
+
+SQLite runs with a rollback journal by default: a writer locks the whole
+file and concurrent readers fail with "database is locked". In WAL mode
+readers keep reading the last committed state while a single writer
+appends to the log, and the busy timeout makes a second writer wait for
+the lock instead of failing at once.
+"""
+from sqlalchemy import event
+
+
+def configure_engines(app, db):
+    """Apply the `SQLITE_PRAGMAS` setting to every new SQLite connection.
+
+    Args:
+        app (Flask): The application whose engines are configured.
+        db (SQLAlchemy): The database extension bound to the app.
+    """
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _pragma_setter(pragmas))
+
+
+def _pragma_setter(pragmas):
+    """Return a `connect` listener running the PRAGMA statements."""
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+    return set_pragmas
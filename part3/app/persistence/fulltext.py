@@ -0,0 +1,245 @@
+"""Full-text search over the text columns of a model.
+
+On SQLite the words are indexed in an FTS5 virtual table, kept in sync
+by the ORM events of the model, and SQLite ranks the matches with BM25
+itself. The in-memory repository uses an inverted index ranking with the
+same formula instead.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from sqlalchemy import DDL, event, func, inspect, literal_column, select
+from sqlalchemy.sql import column, table
+
+# BM25 parameters, the defaults of FTS5
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Names of the FTS5 tables, see `include_name`
+INDEX_TABLES = set()
+# Tables SQLite creates to store an FTS5 table named <name>
+_SHADOW_SUFFIXES = ('_data', '_idx', '_content', '_docsize', '_config')
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Split a text into lowercase words without diacritics.
+
+    Words are split like the `unicode61` tokenizer of FTS5 does, so both
+    indexes find the same documents.
+
+    Returns:
+        list: The words of the text, in order.
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+
+def match_expression(query):
+    """Build the FTS5 query of the documents holding every word of a text.
+
+    Each word is quoted, so the operators and punctuation typed by the
+    user are searched as words instead of being parsed.
+    """
+    return ' '.join(f'"{word}"' for word in tokenize(query))
+
+
+def include_name(name, type_, parent_names):
+    """Hide the FTS5 tables from the autogenerated migrations.
+
+    They are not declared in the metadata, so Alembic would otherwise
+    drop them.
+    """
+    if type_ != 'table':
+        return True
+    return not any(name == index or name in (index + suffix for suffix
+                                             in _SHADOW_SUFFIXES)
+                   for index in INDEX_TABLES)
+
+
+class FullTextIndex:
+    """FTS5 table indexing text columns of a model, on SQLite.
+
+    The table is created and dropped with the table of the model, and
+    updated by the insert, update and delete events of its mapper, so
+    every write made through the ORM is indexed in the same transaction.
+    Bulk UPDATE and DELETE statements bypass these events.
+
+    A row of the index has the rowid of the row of the model it indexes,
+    so writes and searches find it by rowid, which FTS5 looks up without
+    scanning the index. VACUUM may renumber the rowids of the model's
+    table: `refill` the index after it (`flask hbnb reindex`).
+    """
+
+    def __init__(self, name, model, columns):
+        """Declare the index and register its events.
+
+        Args:
+            name (str): Name of the FTS5 table.
+            model: Model class whose text columns are indexed.
+            columns (tuple): Names of the indexed columns.
+        """
+        self.name = name
+        self.model = model
+        self.columns = tuple(columns)
+        self.table = table(name, column('rowid'),
+                           *(column(text_column)
+                             for text_column in self.columns))
+        INDEX_TABLES.add(name)
+
+        model_table = model.__table__
+        self._model_rowid = literal_column(f'{model_table.name}.rowid')
+        event.listen(model_table, 'after_create', DDL(
+            self.create_statement()).execute_if(dialect='sqlite'))
+        event.listen(model_table, 'before_drop', DDL(
+            f'DROP TABLE IF EXISTS {name}').execute_if(dialect='sqlite'))
+        event.listen(model, 'after_insert', self._insert)
+        event.listen(model, 'after_update', self._update)
+        # The rowid of a row is only known until the row is deleted
+        event.listen(model, 'before_delete', self._delete)
+
+    def create_statement(self):
+        """Return the statement creating the FTS5 table."""
+        return (f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} "
+                f"USING fts5({', '.join(self.columns)}, "
+                f"tokenize='unicode61 remove_diacritics 2')")
+
+    def _rows(self):
+        """Select the rowid and indexed columns of the model's rows."""
+        model_table = self.model.__table__
+        return select(self._model_rowid,
+                      *(model_table.c[text_column]
+                        for text_column in self.columns))
+
+    def _rowid(self, target):
+        """Return the subquery of the rowid of an object's row."""
+        model_table = self.model.__table__
+        return (select(self._model_rowid)
+                .select_from(model_table)
+                .where(model_table.c.id == target.id)
+                .scalar_subquery())
+
+    def _values(self, target):
+        """Return the indexed values of an object."""
+        return {text_column: getattr(target, text_column)
+                for text_column in self.columns}
+
+    def _insert(self, mapper, connection, target):
+        if connection.dialect.name == 'sqlite':
+            connection.execute(self.table.insert().from_select(
+                ['rowid', *self.columns],
+                self._rows().where(self.model.__table__.c.id == target.id)))
+
+    def _update(self, mapper, connection, target):
+        if connection.dialect.name != 'sqlite':
+            return
+        state = inspect(target)
+        if any(state.attrs[text_column].history.has_changes()
+               for text_column in self.columns):
+            connection.execute(self.table.update().where(
+                self.table.c.rowid == self._rowid(target)).values(
+                    **self._values(target)))
+
+    def _delete(self, mapper, connection, target):
+        if connection.dialect.name == 'sqlite':
+            connection.execute(self.table.delete().where(
+                self.table.c.rowid == self._rowid(target)))
+
+    def refill(self, connection):
+        """Index every row of the model again, on SQLite."""
+        if connection.dialect.name != 'sqlite':
+            return
+        connection.execute(self.table.delete())
+        connection.execute(self.table.insert().from_select(
+            ['rowid', *self.columns], self._rows()))
+
+    def search(self, query, text, limit):
+        """Restrict a query of the model to the objects matching a text.
+
+        Args:
+            query: Query of the model.
+            text (str): Words the objects must all contain.
+            limit (int): Maximum number of objects to return.
+
+        Returns:
+            Query: (object, score) rows, best match first; the score is
+            the opposite of the BM25 rank of SQLite, higher is better.
+        """
+        rank = func.bm25(literal_column(self.name))
+        return (query
+                .join(self.table, self.table.c.rowid == self._model_rowid)
+                .filter(literal_column(self.name).op('MATCH')(
+                    match_expression(text)))
+                .add_columns((-rank).label('score'))
+                .order_by(rank)
+                .limit(limit))
+
+
+class InvertedIndex:
+    """In-process inverted index ranking documents with BM25.
+
+    Used by the in-memory repository: a search only visits the
+    documents holding the rarest word of the query.
+    """
+
+    def __init__(self):
+        """Initialize an empty index."""
+        self._postings = {}
+        self._lengths = {}
+        self._words = {}
+        self._total_length = 0
+
+    def add(self, key, *texts):
+        """Index the texts of a document, replacing its previous ones."""
+        self.remove(key)
+        words = [word for text in texts for word in tokenize(text)]
+        frequencies = Counter(words)
+        for word, count in frequencies.items():
+            self._postings.setdefault(word, {})[key] = count
+        self._words[key] = set(frequencies)
+        self._lengths[key] = len(words)
+        self._total_length += len(words)
+
+    def remove(self, key):
+        """Remove a document from the index if present."""
+        for word in self._words.pop(key, ()):
+            posting = self._postings[word]
+            del posting[key]
+            if not posting:
+                del self._postings[word]
+        self._total_length -= self._lengths.pop(key, 0)
+
+    def search(self, query, limit=None):
+        """Find the documents holding every word of a query.
+
+        Returns:
+            list: (key, score) tuples, best match first.
+        """
+        postings = [self._postings.get(word)
+                    for word in set(tokenize(query))]
+        if not postings or not all(postings):
+            return []
+        postings.sort(key=len)
+        keys = [key for key in postings[0]
+                if all(key in posting for posting in postings[1:])]
+
+        count = len(self._lengths)
+        average_length = self._total_length / count or 1
+        scores = []
+        for key in keys:
+            norm = 1 - BM25_B + BM25_B * self._lengths[key] / average_length
+            score = 0.0
+            for posting in postings:
+                idf = math.log((count - len(posting) + 0.5) /
+                               (len(posting) + 0.5))
+                frequency = posting[key]
+                score += max(idf, 1e-6) * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * norm)
+            scores.append((key, score))
+        scores.sort(key=lambda result: result[1], reverse=True)
+        return scores[:limit]
@@ -0,0 +1,212 @@
+"""Geospatial helpers used to index and search places by location.
+
+Places are indexed in the database by a geohash column: nearby points
+share a common prefix, so the places around a point can be read with a
+few range scans on an ordinary B-tree index instead of a full table scan.
+The in-memory repository uses a fixed-size grid of cells instead.
+"""
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Precision stored on each place (~5m x 5m cells)
+GEOHASH_PRECISION = 9
+# Maximum number of geohash ranges scanned by a single search
+MAX_COVERING_CELLS = 16
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate into a geohash.
+
+    Args:
+        latitude (float): Latitude in degrees.
+        longitude (float): Longitude in degrees.
+        precision (int): Number of characters of the geohash.
+
+    Returns:
+        str: The geohash of the cell containing the coordinate.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(geohash) < precision:
+        if even:
+            value, interval = longitude, lon_range
+        else:
+            value, interval = latitude, lat_range
+        middle = (interval[0] + interval[1]) / 2
+        if value >= middle:
+            bits = (bits << 1) | 1
+            interval[0] = middle
+        else:
+            bits = bits << 1
+            interval[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(geohash)
+
+
+def cell_size(precision):
+    """Return the (height, width) in degrees of a geohash cell."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Return the great-circle distance between two points in kilometers."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (math.sin(d_phi / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_boxes(latitude, longitude, radius_km):
+    """Compute the boxes enclosing a circle on the globe.
+
+    A circle crossing the antimeridian is split into two boxes.
+
+    Returns:
+        list: (south, west, north, east) tuples in degrees.
+    """
+    # Same sphere as `haversine_km`, or the boxes miss points on the circle
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south = max(-90.0, latitude - d_lat)
+    north = min(90.0, latitude + d_lat)
+    # Meridians converge: the circle spans the most longitude on the edge
+    # of the box nearest the pole, not on its center
+    cos_lat = math.cos(math.radians(max(-south, north)))
+    if south == -90.0 or north == 90.0 or cos_lat <= 1e-9:
+        return [(south, -180.0, north, 180.0)]
+    d_lon = d_lat / cos_lat
+    if d_lon >= 180.0:
+        return [(south, -180.0, north, 180.0)]
+    west = longitude - d_lon
+    east = longitude + d_lon
+    if west < -180.0:
+        return [(south, west + 360.0, north, 180.0),
+                (south, -180.0, north, east)]
+    if east > 180.0:
+        return [(south, west, north, 180.0),
+                (south, -180.0, north, east - 360.0)]
+    return [(south, west, north, east)]
+
+
+def _steps(start, stop, step):
+    """Yield values from start to stop included, `step` apart."""
+    value = start
+    while value < stop:
+        yield value
+        value += step
+    yield stop
+
+
+def covering_cells(latitude, longitude, radius_km,
+                   max_cells=MAX_COVERING_CELLS):
+    """Return geohash prefixes whose cells cover a circle.
+
+    The finest precision that needs at most `max_cells` cells is used, so
+    a search scans a small number of index ranges whatever the radius.
+
+    Returns:
+        set: Geohash prefixes covering the circle.
+    """
+    boxes = bounding_boxes(latitude, longitude, radius_km)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        count = sum(
+            (math.floor((north - south) / height) + 2) *
+            (math.floor((east - west) / width) + 2)
+            for south, west, north, east in boxes)
+        if count <= max_cells or precision == 1:
+            break
+
+    cells = set()
+    for south, west, north, east in boxes:
+        for lat in _steps(south, north, height):
+            for lon in _steps(west, east, width):
+                cells.add(encode(lat, lon, precision))
+    return cells
+
+
+class GridIndex:
+    """In-process spatial index bucketing points into square cells.
+
+    Used by the in-memory repository: a radius search only visits the
+    cells overlapping the circle (or the occupied cells, if fewer).
+    """
+
+    def __init__(self, cell_degrees=0.5):
+        """Initialize an empty grid.
+
+        Args:
+            cell_degrees (float): Side of a grid cell in degrees.
+        """
+        self.cell_degrees = cell_degrees
+        self._cells = {}
+        self._points = {}
+
+    def _cell(self, latitude, longitude):
+        """Return the grid cell containing a coordinate."""
+        return (math.floor(latitude / self.cell_degrees),
+                math.floor(longitude / self.cell_degrees))
+
+    def add(self, key, latitude, longitude):
+        """Index a point, replacing any previous position of `key`."""
+        self.remove(key)
+        cell = self._cell(latitude, longitude)
+        self._cells.setdefault(cell, set()).add(key)
+        self._points[key] = (latitude, longitude, cell)
+
+    def remove(self, key):
+        """Remove a point from the index if present."""
+        point = self._points.pop(key, None)
+        if point:
+            bucket = self._cells[point[2]]
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[point[2]]
+
+    def search(self, latitude, longitude, radius_km):
+        """Find the points within `radius_km` of a coordinate.
+
+        Returns:
+            list: (key, distance_km) tuples sorted by distance.
+        """
+        wanted = set()
+        for south, west, north, east in bounding_boxes(
+                latitude, longitude, radius_km):
+            low = self._cell(south, west)
+            high = self._cell(north, east)
+            area = (high[0] - low[0] + 1) * (high[1] - low[1] + 1)
+            if area > len(self._cells):
+                wanted.update(
+                    cell for cell in self._cells
+                    if low[0] <= cell[0] <= high[0] and
+                    low[1] <= cell[1] <= high[1])
+            else:
+                wanted.update(
+                    (row, col)
+                    for row in range(low[0], high[0] + 1)
+                    for col in range(low[1], high[1] + 1))
+
+        results = []
+        for cell in wanted:
+            for key in self._cells.get(cell, ()):
+                lat, lon, _ = self._points[key]
+                distance = haversine_km(latitude, longitude, lat, lon)
+                if distance <= radius_km:
+                    results.append((key, distance))
+        results.sort(key=lambda result: result[1])
+        return results
@@ -1,5 +1,120 @@
 from abc import ABC, abstractmethod
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+import binascii
+import json
+from operator import attrgetter
+from sqlalchemy import and_, inspect, literal, or_
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
 from app import db
+from app.models.types import BinaryUUID, parse_uuid
+from app.persistence.cache import get_app_cache
+from app.persistence.routing import reading_primary, reads_replica
+
+
+# Keyset order of a paginated query: rows are sorted on `expression`,
+# then on their id. `columns` are the names of the columns `key` reads to
+# compute the value of the expression for a row.
+Ordering = namedtuple('Ordering',
+                      ['expression', 'columns', 'key', 'descending'])
+
+
+def encode_cursor(created_at, obj_id):
+    """Encode a keyset position into an opaque pagination cursor.
+
+    Args:
+        created_at (datetime): Creation date of the last object of a page,
+            or the number it is sorted on for other orderings.
+        obj_id (str): ID of the last object of a page.
+
+    Returns:
+        str: URL-safe cursor to send back to the client.
+    """
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    position = [created_at if created_at is not None else '', obj_id]
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The opaque cursor received from the client.
+
+    Returns:
+        tuple: (created_at, obj_id) where created_at is a datetime, a
+        number for the orderings on numbers, or None.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        created_at, obj_id = json.loads(urlsafe_b64decode(cursor.encode()))
+        if isinstance(created_at, str) and created_at:
+            created_at = datetime.fromisoformat(created_at)
+    except (binascii.Error, TypeError, UnicodeError, ValueError):
+        raise ValueError("Invalid pagination cursor")
+    if not isinstance(obj_id, str) or isinstance(created_at, bool) or \
+            not isinstance(created_at, (str, int, float, datetime)):
+        raise ValueError("Invalid pagination cursor")
+    return created_at if created_at != '' else None, obj_id
+
+
+@contextmanager
+def unit_of_work():
+    """Group the writes of several repository calls in one transaction.
+
+    Inside the block, SQLAlchemy repositories flush their changes instead
+    of committing them; the session is committed once when the outermost
+    block exits, or rolled back if it raises. Blocks may be nested.
+
+    Usage:
+        with unit_of_work():
+            place_repo.add(place)
+            review_repo.update(review_id, data)
+    """
+    info = db.session.info
+    depth = info.get('unit_of_work', 0)
+    info['unit_of_work'] = depth + 1
+    try:
+        yield
+    except BaseException:
+        info['unit_of_work'] = depth
+        if depth == 0:
+            info.pop('after_commit', None)
+            db.session.rollback()
+        raise
+    info['unit_of_work'] = depth
+    if depth == 0:
+        try:
+            db.session.commit()
+        except BaseException:
+            info.pop('after_commit', None)
+            db.session.rollback()
+            raise
+        for callback in info.pop('after_commit', []):
+            callback()
+
+
+def in_unit_of_work():
+    """Return True if a `unit_of_work` block is active on the session."""
+    return db.session.info.get('unit_of_work', 0) > 0
+
+
+def after_commit(callback):
+    """Run `callback` once the current unit of work is committed.
+
+    Outside of a unit of work, the callback runs immediately.
+    """
+    if in_unit_of_work():
+        db.session.info.setdefault('after_commit', []).append(callback)
+    else:
+        callback()
 
 
 class Repository(ABC):
@@ -31,11 +146,15 @@ class Repository(ABC):
         pass
 
     @abstractmethod
-    def get_all(self):
+    def get_all(self, columns=None):
         """Retrieve all objects from the repository.
 
+        Args:
+            columns (list): Names of the only columns to read, or None
+                for whole objects.
+
         Returns:
-            List of all objects.
+            List of all objects, or of rows holding the given columns.
         """
         pass
 
@@ -71,6 +190,34 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    def exists_by(self, **attrs):
+        """Check whether an object matches all the given attribute values.
+
+        Args:
+            **attrs: Attribute names and the values to match.
+
+        Returns:
+            bool: True if at least one object matches, False otherwise.
+        """
+        pass
+
+    @abstractmethod
+    def get_page(self, limit, cursor=None, columns=None):
+        """Retrieve a bounded page of objects ordered by creation date.
+
+        Args:
+            limit (int): Maximum number of objects to return.
+            cursor (str): Opaque cursor returned with the previous page,
+                or None to start from the beginning.
+            columns (list): Names of the only columns to read, or None
+                for whole objects.
+
+        Returns:
+            tuple: (list of objects, cursor of the next page or None).
+        """
+        pass
+
 
 class InMemoryRepository(Repository):
     """In-memory implementation of the Repository interface.
@@ -90,8 +237,12 @@ class InMemoryRepository(Repository):
         """Retrieve an object by its ID."""
         return self._storage.get(obj_id)
 
-    def get_all(self):
-        """Retrieve all stored objects."""
+    def get_all(self, columns=None):
+        """Retrieve all stored objects.
+
+        The objects themselves are returned whatever the columns, they
+        already hold every attribute.
+        """
         return list(self._storage.values())
 
     def update(self, obj_id, data):
@@ -113,33 +264,315 @@ class InMemoryRepository(Repository):
             None
         )
 
+    def exists_by(self, **attrs):
+        """Check whether a stored object matches all the given values."""
+        return any(
+            all(getattr(obj, name, None) == value
+                for name, value in attrs.items())
+            for obj in self._storage.values()
+        )
+
+    def get_page(self, limit, cursor=None, columns=None):
+        """Retrieve a page of objects ordered by (created_at, id)."""
+        def position(obj):
+            created_at = obj.created_at.isoformat() if obj.created_at else ''
+            return created_at, obj.id
+
+        objects = sorted(self._storage.values(), key=position)
+        if cursor:
+            created_at, obj_id = decode_cursor(cursor)
+            start = (created_at.isoformat() if created_at else '', obj_id)
+            objects = [obj for obj in objects if position(obj) > start]
+
+        page = objects[:limit]
+        next_cursor = None
+        if len(objects) > limit:
+            next_cursor = encode_cursor(page[-1].created_at, page[-1].id)
+        return page, next_cursor
+
 
 class SQLAlchemyRepository(Repository):
+    # Named eager-loading presets: profile name -> tuple of
+    # (relationship name, loader option) applied by `_query`
+    loading_profiles = {}
+
     def __init__(self, model):
         self.model = model
 
+    def _query(self, profile=None):
+        """Build the base query, eager loading the relationships of a profile.
+
+        Args:
+            profile (str): Name of an entry of `loading_profiles`, or None
+                to keep the lazy loading declared on the model.
+
+        Raises:
+            KeyError: If the profile is unknown.
+        """
+        query = self.model.query
+        if profile:
+            query = query.options(*[
+                loader(getattr(self.model, relationship))
+                for relationship, loader in self.loading_profiles[profile]
+            ])
+        return query
+
+    def commit(self):
+        """Commit the session, or only flush it inside a unit of work."""
+        if in_unit_of_work():
+            db.session.flush()
+        else:
+            db.session.commit()
+
     def add(self, obj):
         db.session.add(obj)
-        db.session.commit()
+        self.commit()
+
+    def get(self, obj_id, profile=None):
+        # A malformed id would be looked up as a NULL primary key
+        if parse_uuid(obj_id) is None:
+            return None
+        return self._query(profile).get(obj_id)
+
+    def _valid_ids(self, attrs):
+        """Return whether the values given to the UUID columns are UUIDs."""
+        columns = inspect(self.model).columns
+        return all(parse_uuid(value) is not None
+                   for name, value in attrs.items()
+                   if value is not None and name in columns and
+                   isinstance(columns[name].type, BinaryUUID))
+
+    def _columns(self, names):
+        """Return the column attributes of the model with the given names.
+
+        Raises:
+            ValueError: If a name is not a column of the model.
+        """
+        columns = inspect(self.model).column_attrs
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise ValueError('Unknown columns: ' + ', '.join(unknown))
+        return [getattr(self.model, name) for name in names]
 
-    def get(self, obj_id):
-        return self.model.query.get(obj_id)
+    def get_all(self, profile=None, columns=None):
+        """Retrieve all objects, or only some of their columns.
 
-    def get_all(self):
-        return self.model.query.all()
+        Args:
+            profile (str): Loading profile of the objects.
+            columns (list): Names of the only columns to select; rows
+                with these attributes are returned instead of objects.
+        """
+        if columns:
+            return self.model.query.with_entities(
+                *self._columns(columns)).all()
+        return self._query(profile).all()
 
     def update(self, obj_id, data):
         obj = self.get(obj_id)
         if obj:
             for key, value in data.items():
                 setattr(obj, key, value)
-            db.session.commit()
+            self.commit()
 
     def delete(self, obj_id):
         obj = self.get(obj_id)
         if obj:
             db.session.delete(obj)
-            db.session.commit()
+            self.commit()
 
     def get_by_attribute(self, attr_name, attr_value):
         return self.model.query.filter_by(**{attr_name: attr_value}).first()
+
+    def exists_by(self, **attrs):
+        """Check whether a row matches all the given column values.
+
+        Runs a single `SELECT 1 ... LIMIT 1` without loading any object,
+        and none when an id is malformed.
+        """
+        if not self._valid_ids(attrs):
+            return False
+        query = self.model.query.filter_by(**attrs)
+        return query.with_entities(literal(1)).limit(1).first() is not None
+
+    def get_page(self, limit, cursor=None, query=None, profile=None,
+                 columns=None, order=None):
+        """Retrieve a page of objects using keyset pagination.
+
+        Rows are ordered by (created_at, id) and the cursor marks the last
+        row of the previous page, so each call reads at most `limit + 1`
+        rows whatever the size of the table.
+
+        Args:
+            limit (int): Maximum number of objects to return.
+            cursor (str): Opaque cursor of the previous page, or None.
+            query: Optional base query to paginate instead of
+                `self.model.query`.
+            profile (str): Loading profile applied when no query is given.
+            columns (list): Names of the only columns to select; rows
+                with these attributes (and `id` and the columns of the
+                order, needed by the cursor) are returned instead of
+                objects.
+            order (Ordering): Order of the rows, by default the creation
+                date.
+
+        Returns:
+            tuple: (list of objects, cursor of the next page or None).
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        model = self.model
+        if order is None:
+            order = Ordering(model.created_at, ('created_at',),
+                             attrgetter('created_at'), False)
+        expression = order.expression
+        if query is None:
+            query = self._query(profile)
+        if columns:
+            query = query.with_entities(*self._columns(list(dict.fromkeys(
+                [*columns, *order.columns, 'id']))))
+        if cursor:
+            key, obj_id = decode_cursor(cursor)
+            if order.descending:
+                after = or_(expression < key,
+                            and_(expression == key, model.id < obj_id))
+            else:
+                after = or_(expression > key,
+                            and_(expression == key, model.id > obj_id))
+            query = query.filter(after)
+        if order.descending:
+            query = query.order_by(expression.desc(), model.id.desc())
+        else:
+            query = query.order_by(expression, model.id)
+        rows = query.limit(limit + 1).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(order.key(rows[-1]), rows[-1].id)
+        return rows, next_cursor
+
+
+class CachedRepository(Repository):
+    """Read-through cache in front of a SQLAlchemyRepository.
+
+    `get` keeps the column values of the entities it loads in a per-app
+    TTLCache, configured by the `ENTITY_CACHE[name]` setting
+    (`maxsize`, `ttl`); without that setting every call goes straight
+    to the wrapped repository. Writes made through this repository evict
+    the entity. Other methods, including repository specific ones, are
+    forwarded to the wrapped repository.
+
+    With read replicas, a miss reads the primary: values read from a
+    lagging replica would stay in the cache for the whole TTL.
+    """
+
+    def __init__(self, repository, name):
+        """Wrap a repository.
+
+        Args:
+            repository (SQLAlchemyRepository): The repository to cache.
+            name (str): Key of the entity in the `ENTITY_CACHE` setting.
+        """
+        self.repository = repository
+        self.name = name
+
+    def __getattr__(self, name):
+        return getattr(self.repository, name)
+
+    def cache(self):
+        """Return the cache of the current app, or None if disabled."""
+        return get_app_cache(self.name)
+
+    def _serialize(self, obj):
+        """Return the column values of an entity."""
+        return {attr.key: getattr(obj, attr.key)
+                for attr in inspect(self.model).column_attrs}
+
+    def _identity_key(self, obj_id):
+        """Return the key of an entity in the identity map of the session."""
+        return inspect(self.model).identity_key_from_primary_key([obj_id])
+
+    def _restore(self, state):
+        """Attach an entity rebuilt from cached column values to the session.
+
+        The object already in the session is reused if there is one.
+        """
+        obj = db.session.identity_map.get(self._identity_key(state['id']))
+        if obj is not None:
+            return obj
+        obj = inspect(self.model).class_manager.new_instance()
+        for attr, value in state.items():
+            set_committed_value(obj, attr, value)
+        make_transient_to_detached(obj)
+        db.session.add(obj)
+        return obj
+
+    def add(self, obj):
+        self.repository.add(obj)
+        self.invalidate(obj.id)
+
+    def get(self, obj_id, profile=None):
+        """Retrieve an object by its ID, from the cache when possible.
+
+        Calls asking for a loading profile bypass the cache, which only
+        holds column values.
+        """
+        cache = self.cache()
+        if cache is None or profile is not None:
+            return self.repository.get(obj_id, profile=profile)
+        state = cache.get(obj_id)
+        if state is not None:
+            return self._restore(state)
+        # An entity already in the session may come from a replica
+        loaded = (reads_replica(db.session) and
+                  self._identity_key(obj_id) in db.session.identity_map)
+        with reading_primary(db.session):
+            obj = self.repository.get(obj_id)
+        # Values read inside a unit of work may still be rolled back
+        if obj is not None and not loaded and not in_unit_of_work():
+            cache.set(obj_id, self._serialize(obj))
+        return obj
+
+    def get_all(self, profile=None, columns=None):
+        return self.repository.get_all(profile=profile, columns=columns)
+
+    def update(self, obj_id, data):
+        try:
+            self.repository.update(obj_id, data)
+        finally:
+            self.invalidate(obj_id)
+
+    def delete(self, obj_id):
+        try:
+            self.repository.delete(obj_id)
+        finally:
+            self.invalidate(obj_id)
+
+    def get_by_attribute(self, attr_name, attr_value):
+        return self.repository.get_by_attribute(attr_name, attr_value)
+
+    def exists_by(self, **attrs):
+        return self.repository.exists_by(**attrs)
+
+    def get_page(self, limit, cursor=None, **kwargs):
+        return self.repository.get_page(limit, cursor, **kwargs)
+
+    def remember(self, obj):
+        """Cache an entity loaded by another query of the repository."""
+        cache = self.cache()
+        if (cache is not None and not in_unit_of_work() and
+                not reads_replica(db.session)):
+            cache.set(obj.id, self._serialize(obj))
+
+    def invalidate(self, obj_id):
+        """Evict an entity changed outside of this repository.
+
+        Inside a unit of work the entity is evicted again after the
+        commit, in case another request cached it in the meantime.
+        """
+        cache = self.cache()
+        if cache is not None:
+            cache.pop(obj_id)
+            if in_unit_of_work():
+                after_commit(lambda: cache.pop(obj_id))
@@ -0,0 +1,72 @@
+"""Routing of the reads to replicas of the database.
+
+The session sends the SELECT statements of the default database to one
+of the read binds named in `READ_REPLICA_BINDS`, and the flushes and
+other writes to the primary. Once a session has written, it reads from
+the primary too until it is removed at the end of the request, so a
+request always sees its own writes whatever the replication lag.
+Values kept in a cache are read inside `reading_primary`, so the lag of
+a replica does not last as long as their entry.
+"""
+from contextlib import contextmanager
+import random
+from flask import current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql import Select
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session reading from replicas when configured.
+
+    Usage:
+        db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+    Settings:
+        SQLALCHEMY_BINDS: Must declare the replicas, e.g.
+            {'replica': 'sqlite:///replica.db'}.
+        READ_REPLICA_BINDS: Keys of the replicas in SQLALCHEMY_BINDS; one
+            of them is picked for the reads of each session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind,
+                                   **kwargs)
+        replicas = current_app.config.get('READ_REPLICA_BINDS')
+        engines = self._db.engines
+        if bind is not None or not replicas or primary is not engines[None]:
+            return primary
+
+        if self._flushing or not self._is_read(clause):
+            if self._flushing or clause is not None:
+                # Reads from now on must see this write
+                self.info['read_primary'] = True
+            return primary
+        if self.info.get('read_primary') or self.info.get('reading_primary'):
+            return primary
+        if 'read_bind' not in self.info:
+            self.info['read_bind'] = random.choice(list(replicas))
+        return engines[self.info['read_bind']]
+
+    @staticmethod
+    def _is_read(clause):
+        """Return whether a statement may run on a replica."""
+        return (isinstance(clause, Select) and
+                clause._for_update_arg is None)
+
+
+def reads_replica(session):
+    """Return whether the reads of a session may go to a replica now."""
+    return bool(current_app.config.get('READ_REPLICA_BINDS') and
+                not session.info.get('read_primary') and
+                not session.info.get('reading_primary'))
+
+
+@contextmanager
+def reading_primary(session):
+    """Send the reads of a session to the primary inside the block."""
+    session.info['reading_primary'] = (
+        session.info.get('reading_primary', 0) + 1)
+    try:
+        yield
+    finally:
+        session.info['reading_primary'] -= 1
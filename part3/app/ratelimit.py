@@ -0,0 +1,207 @@
+"""Token bucket rate limiting of the login attempts.
+
+Every attempt takes a token from two buckets, one keyed by the email and
+one keyed by the client address, and only when both have one: an attempt
+rejected by its address does not use up the tries of the email, and the
+other way round. An attempt finding an empty bucket is rejected before
+the user lookup and the bcrypt check, so credential stuffing costs a
+dictionary lookup instead of a hash. A successful login refills the
+bucket of its email, so only failed attempts add up against an account.
+
+The buckets live in a backend. MemoryBackend keeps them in the process;
+another store (Redis or a local stand-in) is plugged by subclassing
+RateLimitBackend and naming the class in LOGIN_RATE_LIMIT_BACKEND.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from importlib import import_module
+from threading import Lock
+from time import monotonic
+from flask import current_app
+
+
+class RateLimitBackend(ABC):
+    """Storage of the token buckets."""
+
+    @abstractmethod
+    def consume(self, buckets):
+        """Take one token from each of several buckets, or from none.
+
+        The buckets are checked and updated at once, so the tokens are
+        taken only if every bucket has one.
+
+        Args:
+            buckets (list): (key, capacity, refill_rate) tuples: the key
+                identifies a bucket, capacity is its maximum number of
+                tokens (a new bucket starts full) and refill_rate the
+                tokens added back per second.
+
+        Returns:
+            list: For each bucket, 0 if it has a token, otherwise the
+            number of seconds until its next token.
+        """
+        pass
+
+    @abstractmethod
+    def reset(self, key):
+        """Refill a bucket by forgetting it."""
+        pass
+
+    @abstractmethod
+    def size(self):
+        """Return the number of buckets stored."""
+        pass
+
+
+class MemoryBackend(RateLimitBackend):
+    """Buckets stored in a dictionary of the current process.
+
+    The least recently used buckets are dropped past `maxsize`; a dropped
+    bucket comes back full, which errs on the side of letting users in.
+    """
+
+    def __init__(self, maxsize=100000, clock=monotonic):
+        """Initialize an empty backend.
+
+        Args:
+            maxsize (int): Maximum number of buckets kept.
+            clock (callable): Time source, replaceable in tests.
+        """
+        self.maxsize = maxsize
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def consume(self, buckets):
+        now = self._clock()
+        with self._lock:
+            levels = []
+            waits = []
+            for key, capacity, refill_rate in buckets:
+                tokens, updated = self._buckets.get(key, (capacity, now))
+                tokens = min(capacity,
+                             tokens + (now - updated) * refill_rate)
+                levels.append(tokens)
+                waits.append(0 if tokens >= 1
+                             else (1 - tokens) / refill_rate)
+            taken = 0 if any(waits) else 1
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - taken, now)
+                self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return waits
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+    def size(self):
+        with self._lock:
+            return len(self._buckets)
+
+
+class RateLimiter:
+    """Login buckets of one application and their counters.
+
+    Attributes:
+        limits (dict): `capacity` and `per_seconds` of the buckets, by
+            scope ('email', 'ip').
+        allowed (int): Number of attempts let through.
+        rejected (dict): Number of attempts rejected, by scope.
+    """
+
+    def __init__(self, backend, limits):
+        """Initialize the limiter.
+
+        Args:
+            backend (RateLimitBackend): Storage of the buckets.
+            limits (dict): `capacity` and `per_seconds` by scope, a scope
+                missing from the dictionary is not limited.
+        """
+        self.backend = backend
+        self.limits = limits
+        self.allowed = 0
+        self.rejected = {scope: 0 for scope in limits}
+        self._lock = Lock()
+
+    def hit(self, email, address):
+        """Account for a login attempt.
+
+        Args:
+            email (str): Email the attempt is made for.
+            address (str): Address of the client.
+
+        Returns:
+            float: 0 if the attempt may proceed, otherwise the number of
+            seconds to wait before retrying.
+        """
+        keys = {'email': self._email_key(email), 'ip': f'ip:{address}'}
+        waits = dict(zip(self.limits, self.backend.consume([
+            (keys[scope], limit['capacity'],
+             limit['capacity'] / limit['per_seconds'])
+            for scope, limit in self.limits.items()])))
+        with self._lock:
+            if not any(waits.values()):
+                self.allowed += 1
+                return 0
+            for scope, wait in waits.items():
+                if wait:
+                    self.rejected[scope] += 1
+        return max(waits.values())
+
+    def succeeded(self, email):
+        """Forget the failed attempts made on an email after a login."""
+        self.backend.reset(self._email_key(email))
+
+    @staticmethod
+    def _email_key(email):
+        """Return the bucket key of an email, whatever its case."""
+        return f'email:{str(email).strip().lower()}'
+
+    def stats(self):
+        """Return the counters of the limiter."""
+        with self._lock:
+            return {
+                'allowed': self.allowed,
+                'rejected': dict(self.rejected),
+                'buckets': self.backend.size(),
+                'limits': self.limits
+            }
+
+
+class LoginRateLimiter:
+    """Flask extension limiting the login attempts.
+
+    Settings:
+        LOGIN_RATE_LIMITS: `capacity` and `per_seconds` of the buckets by
+            scope ('email', 'ip'), empty to disable the limiter.
+        LOGIN_RATE_LIMIT_BACKEND: Import path of the RateLimitBackend
+            class storing the buckets.
+    """
+
+    def init_app(self, app):
+        """Create the limiter of an application."""
+        module, _, name = app.config.get(
+            'LOGIN_RATE_LIMIT_BACKEND',
+            'app.ratelimit.MemoryBackend').rpartition('.')
+        backend = getattr(import_module(module), name)()
+        app.extensions['login_rate_limiter'] = RateLimiter(
+            backend, app.config.get('LOGIN_RATE_LIMITS', {}))
+
+    @staticmethod
+    def _limiter():
+        """Return the limiter of the current application."""
+        return current_app.extensions['login_rate_limiter']
+
+    def hit(self, email, address):
+        """Account for a login attempt, see RateLimiter.hit."""
+        return self._limiter().hit(email, address)
+
+    def succeeded(self, email):
+        """Refill the email bucket after a successful login."""
+        self._limiter().succeeded(email)
+
+    def stats(self):
+        """Return the counters of the current application's limiter."""
+        return self._limiter().stats()
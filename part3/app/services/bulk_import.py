@@ -0,0 +1,210 @@
+"""Bulk loading of places, users and amenities from NDJSON.
+
+Each line of the input is a JSON object describing one entity. Rows are
+validated by the model constructors and inserted by chunks, one
+transaction per chunk. A row that cannot be loaded is reported with its
+line number and does not stop the rest of the load.
+"""
+import json
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.hashing import HashingBusyError
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.models.user import User
+
+ENTITIES = ('places', 'users', 'amenities')
+
+
+class ImportReport:
+    """Outcome of a bulk load: number of rows created and row errors."""
+
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, error):
+        """Record a row that could not be loaded.
+
+        Args:
+            line (int): Line number of the row in the input.
+            error (str): Reason of the failure.
+        """
+        self.errors.append({'line': line, 'error': error})
+
+    def to_dict(self):
+        """Return the report as a JSON serializable dictionary."""
+        return {
+            'created': self.created,
+            'failed': len(self.errors),
+            'errors': sorted(self.errors, key=lambda error: error['line'])
+        }
+
+
+class BulkImporter:
+    """Load NDJSON rows of an entity into the database by chunks.
+
+    Each chunk is added in a single flush, which SQLAlchemy sends as
+    multi-row INSERTs, and committed once. If the commit hits a
+    constraint (duplicate email, coordinates or name), the chunk is
+    replayed row by row inside savepoints to report the faulty rows.
+    """
+
+    def __init__(self, facade, chunk_size=500):
+        """Initialize the importer.
+
+        Args:
+            facade (HBnBFacade): Facade used to resolve owners and
+                amenities.
+            chunk_size (int): Number of rows inserted per transaction.
+        """
+        self.facade = facade
+        self.chunk_size = max(1, chunk_size)
+
+    def run(self, entity, lines, owner=None, allow_owner_id=True):
+        """Load the rows of an NDJSON input.
+
+        Args:
+            entity (str): One of 'places', 'users' or 'amenities'.
+            lines (iterable): Lines of the input, as str or bytes.
+            owner (User or Principal): Owner of the places whose row has
+                no owner_id.
+            allow_owner_id (bool): Whether place rows may name another
+                owner than `owner`.
+
+        Returns:
+            ImportReport: Rows created and rows rejected.
+
+        Raises:
+            ValueError: If the entity is unknown.
+        """
+        if entity not in ENTITIES:
+            raise ValueError(f"Unknown entity '{entity}'")
+        report = ImportReport()
+        options = {'owner': owner, 'allow_owner_id': allow_owner_id}
+        chunk = []
+        for line_number, line in enumerate(lines, 1):
+            if isinstance(line, bytes):
+                line = line.decode('utf-8', errors='replace')
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                report.add_error(line_number, 'Invalid JSON')
+                continue
+            if not isinstance(row, dict):
+                report.add_error(line_number, 'A row must be a JSON object')
+                continue
+            chunk.append((line_number, row))
+            if len(chunk) >= self.chunk_size:
+                self._load_chunk(entity, chunk, report, options)
+                chunk = []
+        if chunk:
+            self._load_chunk(entity, chunk, report, options)
+        return report
+
+    def _load_chunk(self, entity, chunk, report, options):
+        """Validate and insert one chunk of rows in one transaction."""
+        context = self._context(entity, chunk, options)
+        built = self._build(entity, chunk, report, context)
+        db.session.add_all(obj for _, obj in built)
+        try:
+            db.session.commit()
+            report.created += len(built)
+            return
+        except IntegrityError:
+            db.session.rollback()
+
+        # Replay the rows one by one to isolate the conflicting ones
+        for line_number, row in chunk:
+            try:
+                with db.session.begin_nested():
+                    # Built inside the savepoint: beginning it flushes the
+                    # session, which must not find the new place in the
+                    # collections of its owner yet
+                    rebuilt = self._build(entity, [(line_number, row)],
+                                          ImportReport(), context)
+                    db.session.add_all(obj for _, obj in rebuilt)
+            except IntegrityError:
+                report.add_error(line_number, 'Conflicts with existing data')
+            else:
+                report.created += len(rebuilt)
+        db.session.commit()
+
+    def _build(self, entity, chunk, report, context):
+        """Build the model objects of a chunk, reporting invalid rows.
+
+        Returns:
+            list: (line number, object) tuples for the valid rows.
+        """
+        builder = getattr(self, f'_build_{entity}')
+        built = []
+        for line_number, row in chunk:
+            try:
+                built.append((line_number, builder(row, context)))
+            except (KeyError, TypeError, ValueError) as error:
+                report.add_error(line_number, self._describe(error))
+            except HashingBusyError:
+                report.add_error(line_number, 'Server busy, retry later')
+        return built
+
+    def _context(self, entity, chunk, options):
+        """Resolve in bulk the related objects the rows of a chunk use."""
+        context = dict(options)
+        if entity != 'places':
+            return context
+
+        owner_ids = {row['owner_id'] for _, row in chunk
+                     if isinstance(row.get('owner_id'), str)}
+        context['owners'] = {user.id: user for user
+                             in self.facade.get_users_by_ids(owner_ids)}
+        names = {name for _, row in chunk
+                 if isinstance(row.get('amenities'), list)
+                 for name in row['amenities'] if isinstance(name, str)}
+        context['amenities'] = self.facade.get_amenities_by_names(names)
+        return context
+
+    @staticmethod
+    def _describe(error):
+        """Return a readable message for a validation error."""
+        if isinstance(error, KeyError):
+            return f'Missing field {error}'
+        return str(error) or 'Invalid input data'
+
+    @staticmethod
+    def _build_places(row, context):
+        """Build a Place from a row."""
+        owner = context['owner']
+        owner_id = row.get('owner_id')
+        if owner_id is not None and (owner is None or owner_id != owner.id):
+            if not context['allow_owner_id']:
+                raise ValueError('You cannot create places for another user')
+            owner = context['owners'].get(owner_id)
+        if owner is None:
+            raise ValueError('Owner not found')
+
+        names = row.get('amenities') or []
+        if type(names) is not list:
+            raise ValueError('amenities must be a list')
+        amenities = []
+        for name in names:
+            amenity = context['amenities'].get(name)
+            if amenity is None:
+                raise ValueError(f"Amenity '{name}' not found")
+            amenities.append(amenity)
+        return Place(row['title'], row.get('description'), row['price'],
+                     row['latitude'], row['longitude'],
+                     amenities=list(dict.fromkeys(amenities)),
+                     user_id=owner.id)
+
+    @staticmethod
+    def _build_users(row, context):
+        """Build a User from a row."""
+        return User(row['first_name'], row['last_name'], row['email'],
+                    row['password'])
+
+    @staticmethod
+    def _build_amenities(row, context):
+        """Build an Amenity from a row."""
+        return Amenity(row['name'])
@@ -1,4 +1,10 @@
-from app.persistence.repository import SQLAlchemyRepository
+from app import db
+from app.persistence.cache import get_app_cache
+from app.persistence.repository import CachedRepository, after_commit
+from app.persistence.repository import in_unit_of_work, unit_of_work
+from app.persistence.routing import reading_primary
+from app.services.bulk_import import BulkImporter
+from app.services.principal import Principal
 from app.models.user import User
 from app.models.amenity import Amenity
 from app.models.place import Place
@@ -11,17 +17,63 @@ from app.services.repositories.review_repository import ReviewRepository
 
 class HBnBFacade:
     """Facade providing a unified interface to manage Users, Places,
-    Amenities, and Reviews using in-memory repositories.
+    Amenities, and Reviews using SQLAlchemy repositories.
 
     This class encapsulates the business logic layer and centralizes
     access to all CRUD operations on the core entities.
     """
 
     def __init__(self):
-        self.user_repo = UserRepository()
-        self.place_repo = PlaceRepository()
+        self.user_repo = CachedRepository(UserRepository(), 'user')
+        self.place_repo = CachedRepository(PlaceRepository(), 'place')
         self.review_repo = ReviewRepository()
-        self.amenity_repo = AmenityRepository()
+        self.amenity_repo = CachedRepository(AmenityRepository(), 'amenity')
+
+    def transaction(self):
+        """Return a context manager committing its writes only once.
+
+        Usage:
+            with facade.transaction():
+                place = facade.create_place(place_data)
+                facade.update_user(user_id, user_data)
+        """
+        return unit_of_work()
+
+    def get_cache_stats(self):
+        """Return the hit/miss counters of the entity caches."""
+        stats = {repo.name: repo.cache().stats()
+                 for repo in (self.user_repo, self.place_repo,
+                              self.amenity_repo)
+                 if repo.cache() is not None}
+        principal_cache = get_app_cache('principal')
+        if principal_cache is not None:
+            stats['principal'] = principal_cache.stats()
+        return stats
+
+    def bulk_import(self, entity, lines, chunk_size, owner=None,
+                    allow_owner_id=True):
+        """Load places, users or amenities from NDJSON lines.
+
+        Args:
+            entity (str): One of 'places', 'users' or 'amenities'.
+            lines (iterable): Lines of the input, one JSON object each.
+            chunk_size (int): Number of rows inserted per transaction.
+            owner (User or Principal): Owner of the places whose row has
+                no owner_id.
+            allow_owner_id (bool): Whether place rows may name another
+                owner.
+
+        Returns:
+            ImportReport: Rows created and rows rejected with the reason.
+        """
+        importer = BulkImporter(self, chunk_size)
+        report = importer.run(entity, lines, owner=owner,
+                              allow_owner_id=allow_owner_id)
+        principal_cache = get_app_cache('principal')
+        if entity == 'places' and principal_cache is not None:
+            # The places may belong to any user
+            principal_cache.clear()
+        return report
 
     """USER"""
 
@@ -34,8 +86,8 @@ class HBnBFacade:
         Returns:
             User: The created user instance.
         """
+        # The constructor already hashes the password
         user = User(**user_data)
-        user.hash_password(user_data['password'])
         self.user_repo.add(user)
         return user
 
@@ -47,13 +99,50 @@ class HBnBFacade:
         """Retrieve a user by email address."""
         return self.user_repo.get_user_by_email(email)
 
-    def get_all_users(self):
-        """Retrieve all users."""
-        return self.user_repo.get_all()
+    def get_users_by_ids(self, user_ids):
+        """Retrieve the users matching a collection of IDs."""
+        return self.user_repo.get_users_by_ids(user_ids)
+
+    def get_principal(self, user_id):
+        """Retrieve what the authorization checks need about a user.
+
+        Principals are kept in the `principal` cache for a short time,
+        and evicted when the user or their places change. They are read
+        from the primary, as a lagging replica may miss a new place.
+
+        Returns:
+            Principal: The principal, or None if the user does not exist.
+        """
+        cache = get_app_cache('principal')
+        principal = cache.get(user_id) if cache is not None else None
+        if principal is None:
+            with reading_primary(db.session):
+                rows = self.user_repo.get_principal_rows(user_id)
+            if not rows:
+                return None
+            principal = Principal(user_id, rows[0][0],
+                                  [place_id for _, place_id in rows
+                                   if place_id is not None])
+            if cache is not None and not in_unit_of_work():
+                cache.set(user_id, principal)
+        return principal
+
+    def invalidate_principal(self, user_id):
+        """Evict a user's principal after a change of their rights."""
+        cache = get_app_cache('principal')
+        if cache is not None:
+            cache.pop(user_id)
+            if in_unit_of_work():
+                after_commit(lambda: cache.pop(user_id))
+
+    def get_all_users(self, columns=None):
+        """Retrieve all users, or only the given columns of them."""
+        return self.user_repo.get_all(columns=columns)
 
     def update_user(self, user_id, update_data):
         """Update a user by ID."""
         self.user_repo.update(user_id, update_data)
+        self.invalidate_principal(user_id)
 
     """"AMENITY"""
 
@@ -71,13 +160,51 @@ class HBnBFacade:
         """Retrieve an amenity by its name."""
         return self.amenity_repo.get_amenity_by_name(name)
 
-    def get_all_amenities(self):
-        """Retrieve all amenities."""
-        return self.amenity_repo.get_all()
+    def get_amenities_by_names(self, names):
+        """Retrieve the amenities matching a list of names.
+
+        Names already resolved are looked up by ID through the amenity
+        cache, the others are fetched together with a single query.
+
+        Args:
+            names (list): Names of the amenities.
+
+        Returns:
+            dict: The amenities found, keyed by name. Unknown names are
+            left out.
+        """
+        name_cache = get_app_cache('amenity_name')
+        found = {}
+        missing = []
+        for name in dict.fromkeys(names):
+            amenity = None
+            if name_cache is not None:
+                amenity_id = name_cache.get(name)
+                amenity = self.get_amenity(amenity_id) if amenity_id else None
+            if amenity is not None and amenity.name == name:
+                found[name] = amenity
+            else:
+                missing.append(name)
+
+        for amenity in self.amenity_repo.get_amenities_by_names(missing):
+            found[amenity.name] = amenity
+            self.amenity_repo.remember(amenity)
+            if name_cache is not None:
+                name_cache.set(amenity.name, amenity.id)
+        return found
+
+    def get_all_amenities(self, columns=None):
+        """Retrieve all amenities, or only the given columns of them."""
+        return self.amenity_repo.get_all(columns=columns)
 
     def update_amenity(self, amenity_id, amenity_data):
         """Update an amenity by ID."""
+        amenity = self.amenity_repo.get(amenity_id)
+        old_name = amenity.name if amenity else None
         self.amenity_repo.update(amenity_id, amenity_data)
+        name_cache = get_app_cache('amenity_name')
+        if name_cache is not None and old_name:
+            name_cache.pop(old_name)
 
     """PLACE"""
 
@@ -85,57 +212,167 @@ class HBnBFacade:
         """Create a new place."""
         place = Place(**place_data)
         self.place_repo.add(place)
+        self.invalidate_principal(place.user_id)
         return place
 
     def get_place(self, place_id):
         """Retrieve a place by ID."""
         return self.place_repo.get(place_id)
 
+    def get_place_details(self, place_id):
+        """Retrieve a place by ID with its owner and amenities loaded."""
+        return self.place_repo.get(place_id, profile='place_detail')
+
     def get_place_by_localisation(self, place_lat, place_long):
         """Check if a place exists at given latitude and longitude.
 
         Returns:
             bool: True if a place exists at the coordinates, False otherwise.
         """
-        latitude = self.place_repo.get_by_attribute('latitude', place_lat)
-        longitude = self.place_repo.get_by_attribute('longitude', place_long)
-        if latitude is None or longitude is None:
-            return False
-        else:
-            return True
+        return self.place_repo.exists_by(latitude=place_lat,
+                                         longitude=place_long)
 
     def get_all_places(self):
         """Retrieve all places."""
         return self.place_repo.get_all()
 
+    def get_places_page(self, limit, cursor=None, columns=None,
+                        sort='created_at', **filters):
+        """Retrieve one page of places.
+
+        Args:
+            limit (int): Maximum number of places to return.
+            cursor (str): Cursor returned with the previous page, or None.
+            columns (list): Names of the only columns to read, or None
+                for whole places.
+            sort (str): `created_at`, `price` or `rating`, prefixed with
+                '-' for the descending order.
+            **filters: `min_price`, `max_price` and `amenities` (names
+                of amenities the places must all have).
+
+        Returns:
+            tuple: (list of places, cursor of the next page or None).
+
+        Raises:
+            ValueError: If the sort key or the cursor is invalid.
+        """
+        return self.place_repo.get_filtered_page(
+            limit, cursor, columns=columns, sort=sort, **filters)
+
+    def search_places_nearby(self, latitude, longitude, radius_km):
+        """Retrieve the places located within a radius of a point.
+
+        Args:
+            latitude (float): Latitude of the center of the search.
+            longitude (float): Longitude of the center of the search.
+            radius_km (float): Radius of the search in kilometers.
+
+        Returns:
+            list: (place, distance_km) tuples, nearest first.
+        """
+        return self.place_repo.get_within_radius(latitude, longitude,
+                                                 radius_km)
+
+    def search_places_text(self, text, limit, place_ids=None):
+        """Retrieve the places whose title or description matches words.
+
+        Args:
+            text (str): Words the places must all contain.
+            limit (int): Maximum number of places to return.
+            place_ids (collection): IDs the places must be among, or None
+                to search every place.
+
+        Returns:
+            list: (place, score) tuples, best match first.
+        """
+        return self.place_repo.search_text(text, limit, place_ids)
+
     def update_place(self, place_id, place_data):
         """Update a place by ID."""
         self.place_repo.update(place_id, place_data)
 
+    def is_place_owner(self, place_id, user_id):
+        """Check whether a user owns a place.
+
+        Only the primary and foreign keys are read, the owner is not
+        loaded.
+
+        Returns:
+            bool: True if the place exists and belongs to the user.
+        """
+        return self.place_repo.exists_by(id=place_id, user_id=user_id)
+
     """REVIEW"""
 
     def create_review(self, review_data):
-        """Create a new review."""
+        """Create a new review and count it in the place's rating."""
         review = Review(**review_data)
-        self.review_repo.add(review)
+        with self.transaction():
+            self.review_repo.add(review)
+            self._adjust_place_rating(review.place.id, 1, review.rating)
         return review
 
     def get_review(self, review_id):
-        """Retrieve a review by ID."""
-        return self.review_repo.get(review_id)
+        """Retrieve a review by ID with its author and place loaded."""
+        return self.review_repo.get(review_id, profile='review_list')
+
+    def get_all_reviews(self, columns=None):
+        """Retrieve all reviews with their authors and places loaded.
+
+        When columns are given, only these columns are read and the
+        authors and places are not loaded.
+        """
+        if columns:
+            return self.review_repo.get_all(columns=columns)
+        return self.review_repo.get_all(profile='review_list')
+
+    def is_review_author(self, review_id, user_id):
+        """Check whether a user wrote a review.
 
-    def get_all_reviews(self):
-        """Retrieve all reviews."""
-        return self.review_repo.get_all()
+        Only the primary and foreign keys are read, the author is not
+        loaded.
+
+        Returns:
+            bool: True if the review exists and was written by the user.
+        """
+        return self.review_repo.exists_by(id=review_id, user_id=user_id)
+
+    def has_reviewed(self, user_id, place_id):
+        """Check whether a user already reviewed a place.
+
+        Answered by the unique index on (user_id, place_id), whatever the
+        number of reviews of the place.
+        """
+        return self.review_repo.exists_by(user_id=user_id,
+                                          place_id=place_id)
 
     def get_reviews_by_place(self, place_id):
         """Retrieve the first review for a given place ID."""
         return self.review_repo.get_by_attribute('place_id', place_id)
 
     def update_review(self, review_id, review_data):
-        """Update a review by ID."""
-        self.review_repo.update(review_id, review_data)
+        """Update a review by ID, keeping the place's rating in sync."""
+        review = self.review_repo.get(review_id)
+        if not review:
+            return
+        old_rating = review.rating
+        with self.transaction():
+            self.review_repo.update(review_id, review_data)
+            if review.rating != old_rating:
+                self._adjust_place_rating(review.place.id, 0,
+                                          review.rating - old_rating)
 
     def delete_review(self, review_id):
-        """Delete a review by ID."""
-        self.review_repo.delete(review_id)
+        """Delete a review by ID and remove it from the place's rating."""
+        review = self.review_repo.get(review_id)
+        if not review:
+            return
+        place_id, rating = review.place.id, review.rating
+        with self.transaction():
+            self.review_repo.delete(review_id)
+            self._adjust_place_rating(place_id, -1, -rating)
+
+    def _adjust_place_rating(self, place_id, count_delta, rating_delta):
+        """Update the rating aggregates of a place and evict it from cache."""
+        self.place_repo.adjust_rating(place_id, count_delta, rating_delta)
+        self.place_repo.invalidate(place_id)
@@ -0,0 +1,25 @@
+class Principal:
+    """Authenticated user as seen by the authorization checks.
+
+    Holds only what the resources need to authorize a request, so it can
+    be cached between requests instead of loading the user row.
+
+    Attributes:
+        id (str): ID of the user.
+        is_admin (bool): Whether the user has admin privileges.
+        place_ids (frozenset): IDs of the places the user owns.
+    """
+
+    __slots__ = ('id', 'is_admin', 'place_ids')
+
+    def __init__(self, user_id, is_admin, place_ids=()):
+        self.id = user_id
+        self.is_admin = bool(is_admin)
+        self.place_ids = frozenset(place_ids)
+
+    def owns(self, place_id):
+        """Return whether the user owns a place."""
+        return place_id in self.place_ids
+
+    def __repr__(self):
+        return f"<Principal {self.id}>"
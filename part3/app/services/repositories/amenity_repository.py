@@ -9,3 +9,9 @@ class AmenityRepository(SQLAlchemyRepository):
 
     def get_amenity_by_name(self, name):
         return self.model.query.filter_by(name=name).first()
+
+    def get_amenities_by_names(self, names):
+        """Retrieve the amenities matching a list of names in one query."""
+        if not names:
+            return []
+        return self.model.query.filter(self.model.name.in_(names)).all()
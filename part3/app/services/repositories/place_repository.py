@@ -1,8 +1,226 @@
-from app.models.place import Place
+from operator import attrgetter
+from app.models.amenity import Amenity, place_amenity
+from app.models.place import Place, search_index
 from app import db
+from app.persistence import fulltext, geo
+from app.persistence.repository import InMemoryRepository, Ordering
 from app.persistence.repository import SQLAlchemyRepository
+from sqlalchemy import Float, and_, cast, func, or_
+from sqlalchemy.orm import joinedload, selectinload
+
+
+def _average_rating(place):
+    """Unrounded average rating of a place, 0 if it has no review."""
+    if not place.review_count:
+        return 0.0
+    return place.rating_sum / place.review_count
 
 
 class PlaceRepository(SQLAlchemyRepository):
+    loading_profiles = {
+        # Owner and amenities of a single place, in two statements
+        'place_detail': (('user', joinedload),
+                         ('amenities', selectinload)),
+    }
+
+    # Sort keys of the place list; a leading '-' reverses the order.
+    # Places without review are rated 0, after the others by rating.
+    orderings = {
+        'created_at': (Place.created_at, ('created_at',),
+                       attrgetter('created_at')),
+        'price': (Place.price, ('price',), attrgetter('price')),
+        'rating': (func.coalesce(cast(Place.rating_sum, Float) /
+                                 func.nullif(Place.review_count, 0), 0.0),
+                   ('review_count', 'rating_sum'), _average_rating),
+    }
+
     def __init__(self):
         super().__init__(Place)
+
+    def ordering(self, sort):
+        """Return the keyset order of a sort key.
+
+        Args:
+            sort (str): Name of an entry of `orderings`, prefixed with
+                '-' for the descending order.
+
+        Raises:
+            ValueError: If the sort key is unknown.
+        """
+        name = sort[1:] if sort.startswith('-') else sort
+        if name not in self.orderings:
+            raise ValueError(f'Unknown sort key: {sort}')
+        return Ordering(*self.orderings[name],
+                        descending=sort.startswith('-'))
+
+    def filtered_query(self, min_price=None, max_price=None, amenities=None):
+        """Build the query of the places matching the given filters.
+
+        The places having every amenity are found with a semi-join on
+        the association table: its rows for the wanted amenities are
+        grouped by place, and only the places with one row per amenity
+        are kept.
+
+        Args:
+            min_price (float): Lowest price per night, or None.
+            max_price (float): Highest price per night, or None.
+            amenities (list): Names of the amenities a place must all
+                have, or None.
+        """
+        query = self.model.query
+        if min_price is not None:
+            query = query.filter(self.model.price >= min_price)
+        if max_price is not None:
+            query = query.filter(self.model.price <= max_price)
+        if amenities:
+            names = set(amenities)
+            matching = (
+                db.session.query(place_amenity.c.place_id)
+                .join(Amenity, Amenity.id == place_amenity.c.amenity_id)
+                .filter(Amenity.name.in_(names))
+                .group_by(place_amenity.c.place_id)
+                .having(func.count() == len(names))
+            )
+            query = query.filter(self.model.id.in_(matching))
+        return query
+
+    def get_filtered_page(self, limit, cursor=None, columns=None,
+                          sort='created_at', **filters):
+        """Retrieve a page of the places matching filters, in any order.
+
+        Args:
+            limit (int): Maximum number of places to return.
+            cursor (str): Cursor of the previous page, or None.
+            columns (list): Names of the only columns to read, or None.
+            sort (str): Sort key, see `ordering`.
+            **filters: Filters accepted by `filtered_query`.
+
+        Returns:
+            tuple: (list of places, cursor of the next page or None).
+
+        Raises:
+            ValueError: If the sort key or the cursor is invalid.
+        """
+        return self.get_page(limit, cursor,
+                             query=self.filtered_query(**filters),
+                             columns=columns, order=self.ordering(sort))
+
+    def adjust_rating(self, place_id, count_delta, rating_delta):
+        """Apply a change to the rating aggregates of a place.
+
+        The aggregates are incremented in SQL, so concurrent reviews of
+        the same place do not overwrite each other.
+
+        Args:
+            place_id (str): ID of the reviewed place.
+            count_delta (int): Change of the number of reviews.
+            rating_delta (int): Change of the sum of the ratings.
+        """
+        self.model.query.filter_by(id=place_id).update({
+            self.model.review_count: self.model.review_count + count_delta,
+            self.model.rating_sum: self.model.rating_sum + rating_delta
+        })
+        self.commit()
+
+    def get_within_radius(self, latitude, longitude, radius_km):
+        """Retrieve the places located within a radius of a point.
+
+        Candidates are read with range scans on the indexed geohash
+        column, then filtered on their exact distance.
+
+        Returns:
+            list: (place, distance_km) tuples sorted by distance.
+        """
+        cells = geo.covering_cells(latitude, longitude, radius_km)
+        candidates = self.model.query.filter(or_(*[
+            and_(self.model.geohash >= cell, self.model.geohash < cell + '{')
+            for cell in cells
+        ])).all()
+
+        results = []
+        for place in candidates:
+            distance = geo.haversine_km(latitude, longitude,
+                                        place.latitude, place.longitude)
+            if distance <= radius_km:
+                results.append((place, distance))
+        results.sort(key=lambda result: result[1])
+        return results
+
+    def search_text(self, text, limit, place_ids=None):
+        """Retrieve the places whose title or description has every word.
+
+        On SQLite the words are looked up in the `places_fts` full-text
+        index and ranked by BM25. Other databases have no such index here
+        and fall back to case-insensitive LIKE filters, scored 0.
+
+        Args:
+            text (str): Words to search.
+            limit (int): Maximum number of places to return.
+            place_ids (collection): IDs the places must be among, or None.
+
+        Returns:
+            list: (place, score) tuples, best match first.
+        """
+        words = fulltext.tokenize(text)
+        if not words or place_ids is not None and not place_ids:
+            return []
+        query = self.model.query
+        if place_ids is not None:
+            query = query.filter(self.model.id.in_(place_ids))
+        if db.engine.dialect.name == 'sqlite':
+            return [tuple(row) for row in
+                    search_index.search(query, text, limit).all()]
+        for word in words:
+            pattern = f'%{word}%'
+            query = query.filter(or_(self.model.title.ilike(pattern),
+                                     self.model.description.ilike(pattern)))
+        return [(place, 0.0) for place in query.order_by(
+            self.model.created_at, self.model.id).limit(limit).all()]
+
+
+class InMemoryPlaceRepository(InMemoryRepository):
+    """In-memory place storage with a grid index on the coordinates."""
+
+    def __init__(self):
+        super().__init__()
+        self._grid = geo.GridIndex()
+        self._text = fulltext.InvertedIndex()
+
+    def add(self, obj):
+        super().add(obj)
+        self._grid.add(obj.id, obj.latitude, obj.longitude)
+        self._text.add(obj.id, obj.title, obj.description)
+
+    def update(self, obj_id, data):
+        super().update(obj_id, data)
+        obj = self.get(obj_id)
+        if obj:
+            self._grid.add(obj.id, obj.latitude, obj.longitude)
+            self._text.add(obj.id, obj.title, obj.description)
+
+    def delete(self, obj_id):
+        super().delete(obj_id)
+        self._grid.remove(obj_id)
+        self._text.remove(obj_id)
+
+    def get_within_radius(self, latitude, longitude, radius_km):
+        """Retrieve the places located within a radius of a point.
+
+        Returns:
+            list: (place, distance_km) tuples sorted by distance.
+        """
+        return [(self.get(place_id), distance) for place_id, distance
+                in self._grid.search(latitude, longitude, radius_km)]
+
+    def search_text(self, text, limit, place_ids=None):
+        """Retrieve the places whose title or description has every word.
+
+        Returns:
+            list: (place, score) tuples, best match first.
+        """
+        results = self._text.search(text)
+        if place_ids is not None:
+            results = [(place_id, score) for place_id, score in results
+                       if place_id in place_ids]
+        return [(self.get(place_id), score)
+                for place_id, score in results[:limit]]
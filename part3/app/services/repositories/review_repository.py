@@ -1,8 +1,14 @@
 from app.models.review import Review
 from app import db
 from app.persistence.repository import SQLAlchemyRepository
+from sqlalchemy.orm import joinedload
 
 
 class ReviewRepository(SQLAlchemyRepository):
+    loading_profiles = {
+        # Author and place of each review joined in the same statement
+        'review_list': (('user', joinedload), ('place', joinedload)),
+    }
+
     def __init__(self):
         super().__init__(Review)
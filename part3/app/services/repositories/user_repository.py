@@ -1,3 +1,4 @@
+from app.models.place import Place
 from app.models.user import User
 from app import db
 from app.persistence.repository import SQLAlchemyRepository
@@ -9,3 +10,20 @@ class UserRepository(SQLAlchemyRepository):
 
     def get_user_by_email(self, email):
         return self.model.query.filter_by(email=email).first()
+
+    def get_users_by_ids(self, user_ids):
+        """Retrieve the users matching a collection of IDs in one query."""
+        if not user_ids:
+            return []
+        return self.model.query.filter(self.model.id.in_(user_ids)).all()
+
+    def get_principal_rows(self, user_id):
+        """Retrieve the admin flag and the place IDs of a user in one query.
+
+        Returns:
+            list: (is_admin, place_id) tuples, place_id being None for a
+            user without places. Empty if the user does not exist.
+        """
+        return db.session.query(self.model.is_admin, Place.id).outerjoin(
+            Place, Place.user_id == self.model.id).filter(
+            self.model.id == user_id).all()
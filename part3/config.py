@@ -4,15 +4,136 @@ import os
 class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     DEBUG = False
+    # bcrypt cost factor, each increment doubles the hashing time
+    BCRYPT_LOG_ROUNDS = 12
+    # Worker processes hashing passwords (0 hashes in the request thread)
+    # and maximum number of hashes waiting for them
+    PASSWORD_HASH_WORKERS = os.cpu_count() or 1
+    PASSWORD_HASH_MAX_PENDING = 64
+    # Seconds a request waits for a hashing worker before a 503
+    PASSWORD_HASH_TIMEOUT = 30
+    # Token buckets of the login attempts: `capacity` attempts, refilled
+    # over `per_seconds`, per email and per client address
+    LOGIN_RATE_LIMITS = {
+        'email': {'capacity': 5, 'per_seconds': 300},
+        'ip': {'capacity': 30, 'per_seconds': 60},
+    }
+    # Storage of the login buckets, a RateLimitBackend subclass
+    LOGIN_RATE_LIMIT_BACKEND = 'app.ratelimit.MemoryBackend'
+    # Email addresses: 'syntax' checks their form only, 'background' also
+    # checks in worker threads that their domain accepts mail and rejects
+    # the domains found undeliverable, 'dns' checks the domain before
+    # accepting the address (DNS queries on the request path)
+    EMAIL_VALIDATION = 'background'
+    # Domain results kept: LRU size and lifetime (seconds)
+    EMAIL_DOMAIN_CACHE = {'maxsize': 10000, 'ttl': 3600}
+    EMAIL_CHECK_WORKERS = 2
+    EMAIL_CHECK_MAX_PENDING = 256
+    EMAIL_DNS_TIMEOUT = 5
+    # Default and maximum number of rows returned by a paginated list
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 100
+    # Largest radius accepted by the place location search
+    MAX_SEARCH_RADIUS_KM = 500
+    # Applied to every new SQLite connection: readers do not block on
+    # the writer (WAL), commits skip a sync per transaction (NORMAL is
+    # safe in WAL mode), 256 MiB of the file is memory-mapped and a
+    # locked database is retried for 5 seconds
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,
+        'busy_timeout': 5000,
+    }
+    # Count SQL statements per request (Server-Timing header, /_metrics)
+    SQL_INSTRUMENTATION = True
+    # Number of rows inserted per transaction by the bulk imports
+    BULK_IMPORT_CHUNK_SIZE = 500
+    # Read-through cache of entities by id: LRU size and lifetime (seconds)
+    # per entity, remove an entry to disable the cache of that entity
+    ENTITY_CACHE = {
+        'user': {'maxsize': 1024, 'ttl': 60},
+        'place': {'maxsize': 4096, 'ttl': 60},
+        'amenity': {'maxsize': 256, 'ttl': 300},
+        'amenity_name': {'maxsize': 1024, 'ttl': 300},
+        # Authenticated users (admin flag, owned places), by user id
+        'principal': {'maxsize': 4096, 'ttl': 30},
+    }
+
+    @staticmethod
+    def init_app(app):
+        """Complete the settings of an app when it is created."""
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///development.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    BCRYPT_LOG_ROUNDS = 10
+    EMAIL_VALIDATION = 'syntax'
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    BCRYPT_LOG_ROUNDS = 4
+    PASSWORD_HASH_WORKERS = 0
+    EMAIL_VALIDATION = 'syntax'
+
+
+def _database_url():
+    """Return DATABASE_URL, accepting the `postgres://` scheme alias.
+
+    Raises:
+        RuntimeError: If DATABASE_URL is not set.
+    """
+    url = os.getenv('DATABASE_URL')
+    if not url:
+        raise RuntimeError("DATABASE_URL must be set in production")
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def _replica_binds():
+    """Return the read replicas listed in DATABASE_REPLICA_URLS."""
+    urls = [url.strip() for url
+            in os.getenv('DATABASE_REPLICA_URLS', '').split(',')
+            if url.strip()]
+    return {f'replica_{index}': url for index, url in enumerate(urls)}
+
+
+class ProductionConfig(Config):
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    @staticmethod
+    def init_app(app):
+        """Read the databases from the environment of the app's process.
+
+        Raises:
+            RuntimeError: If DATABASE_URL is not set.
+        """
+        app.config['SQLALCHEMY_DATABASE_URI'] = _database_url()
+        # Read replicas (comma separated URLs), the reads of a request go
+        # to one of them until the request writes
+        binds = _replica_binds()
+        app.config['SQLALCHEMY_BINDS'] = binds
+        app.config['READ_REPLICA_BINDS'] = tuple(binds)
+        # Connections kept open, extra ones allowed under load,
+        # connections checked before use and replaced after
+        # `pool_recycle` seconds (before the server drops them)
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            'pool_size': int(os.getenv('DB_POOL_SIZE', 10)),
+            'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 20)),
+            'pool_pre_ping': True,
+            'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        }
 
 
 config = {
     'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
     'default': DevelopmentConfig
 }
@@ -0,0 +1,100 @@
+"""initial schema
+
+Schema of the models before the migrations were introduced, as built by
+`db.create_all()`. Such a database is only stamped, then upgraded:
+
+    flask db stamp 0001
+    flask db upgrade
+
+The foreign keys were declared INTEGER while the ids they reference are
+VARCHAR(36), which SQLite accepts. Other databases reject foreign keys
+of another type than their target, and never had this schema, so they
+get VARCHAR(36) foreign keys at once.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 05:18:11.722541
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _base_columns():
+    """Return the id and timestamp columns shared by every model."""
+    return [
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ]
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        key_type = sa.Integer()
+    else:
+        key_type = sa.String(length=36)
+
+    op.create_table(
+        'users',
+        sa.Column('first_name', sa.String(length=50), nullable=False),
+        sa.Column('last_name', sa.String(length=50), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('password', sa.String(length=128), nullable=False),
+        sa.Column('is_admin', sa.Boolean(), nullable=True),
+        *_base_columns(),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table(
+        'amenities',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        *_base_columns(),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table(
+        'places',
+        sa.Column('title', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.String(length=250), nullable=True),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.Column('user_id', key_type, nullable=False),
+        *_base_columns(),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'])
+    )
+    op.create_table(
+        'place_amenity',
+        sa.Column('place_id', key_type, nullable=False),
+        sa.Column('amenity_id', key_type, nullable=False),
+        sa.PrimaryKeyConstraint('place_id', 'amenity_id'),
+        sa.ForeignKeyConstraint(['place_id'], ['places.id']),
+        sa.ForeignKeyConstraint(['amenity_id'], ['amenities.id'])
+    )
+    op.create_table(
+        'reviews',
+        sa.Column('text', sa.String(length=500), nullable=True),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('user_id', key_type, nullable=False),
+        sa.Column('place_id', key_type, nullable=False),
+        *_base_columns(),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.ForeignKeyConstraint(['place_id'], ['places.id'])
+    )
+
+
+def downgrade():
+    op.drop_table('reviews')
+    op.drop_table('place_amenity')
+    op.drop_table('places')
+    op.drop_table('amenities')
+    op.drop_table('users')
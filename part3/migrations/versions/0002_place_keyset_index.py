@@ -0,0 +1,28 @@
+"""place keyset index
+
+Back the (created_at, id) keyset used to paginate the place list.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 05:18:14.102315
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('places', schema=None) as batch_op:
+        batch_op.create_index('ix_places_created_at_id',
+                              ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('places', schema=None) as batch_op:
+        batch_op.drop_index('ix_places_created_at_id')
@@ -0,0 +1,47 @@
+"""place geohash
+
+Add the indexed geohash of the coordinates searched by the radius
+queries, and compute it for the existing places.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 05:18:15.637920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from app.persistence import geo
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Precision of the geohash stored on each place
+PRECISION = 9
+
+places = sa.table('places', sa.column('id'), sa.column('latitude'),
+                  sa.column('longitude'), sa.column('geohash'))
+
+
+def upgrade():
+    with op.batch_alter_table('places', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12),
+                                      nullable=True))
+        batch_op.create_index(batch_op.f('ix_places_geohash'), ['geohash'],
+                              unique=False)
+
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(places.c.id, places.c.latitude,
+                                  places.c.longitude)).all()
+    for place_id, latitude, longitude in rows:
+        bind.execute(places.update().where(places.c.id == place_id).values(
+            geohash=geo.encode(latitude, longitude, PRECISION)))
+
+
+def downgrade():
+    with op.batch_alter_table('places', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_places_geohash'))
+        batch_op.drop_column('geohash')
@@ -0,0 +1,31 @@
+"""unique place coordinates
+
+Forbid two places at the same coordinates; the duplicate check of the
+place creation is one lookup on this constraint's index. Existing
+duplicates must be removed first.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 05:18:16.918254
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('places', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_places_latitude_longitude',
+                                          ['latitude', 'longitude'])
+
+
+def downgrade():
+    with op.batch_alter_table('places', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_places_latitude_longitude',
+                                 type_='unique')
@@ -0,0 +1,45 @@
+"""place rating aggregates
+
+Add the number of reviews and the sum of their ratings to the places,
+computed from the existing reviews.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 05:18:18.264107
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+places = sa.table('places', sa.column('id'), sa.column('review_count'),
+                  sa.column('rating_sum'))
+reviews = sa.table('reviews', sa.column('place_id'), sa.column('rating'))
+
+
+def upgrade():
+    with op.batch_alter_table('places', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('review_count', sa.Integer(),
+                                      server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('rating_sum', sa.Integer(),
+                                      server_default='0', nullable=False))
+
+    of_place = reviews.c.place_id == places.c.id
+    op.execute(places.update().values(
+        review_count=sa.select(sa.func.count()).where(of_place)
+        .scalar_subquery(),
+        rating_sum=sa.select(sa.func.coalesce(sa.func.sum(reviews.c.rating),
+                                              0)).where(of_place)
+        .scalar_subquery()))
+
+
+def downgrade():
+    with op.batch_alter_table('places', schema=None) as batch_op:
+        batch_op.drop_column('rating_sum')
+        batch_op.drop_column('review_count')
@@ -0,0 +1,29 @@
+"""unique amenity names
+
+Index the amenity names, unique, to resolve them in bulk. Existing
+duplicates must be merged first.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 05:18:19.540811
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('amenities', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_amenities_name'), ['name'],
+                              unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('amenities', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_amenities_name'))
@@ -0,0 +1,30 @@
+"""unique reviews
+
+A user reviews a place once. Existing duplicate reviews must be removed
+first.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 05:18:20.883472
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_reviews_user_id_place_id',
+                                          ['user_id', 'place_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_reviews_user_id_place_id',
+                                 type_='unique')
@@ -0,0 +1,95 @@
+"""binary uuid keys
+
+Store the ids and the foreign keys in 16 bytes instead of their 36
+characters string form. The values are converted before the type of the
+columns changes, so the copy of the tables made by the batch operations
+on SQLite keeps them as they are. On PostgreSQL the columns become
+native UUIDs through a cast, the foreign keys being dropped meanwhile:
+the type of a key cannot change while another column references it.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 05:20:43.628715
+
+"""
+import uuid
+from alembic import op
+import sqlalchemy as sa
+from app.models.types import BinaryUUID
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+# Columns holding an id, by table
+COLUMNS = {
+    'users': ('id',),
+    'amenities': ('id',),
+    'places': ('id', 'user_id'),
+    'place_amenity': ('place_id', 'amenity_id'),
+    'reviews': ('id', 'user_id', 'place_id'),
+}
+
+# Foreign keys on the ids, under the names PostgreSQL gives by default
+FOREIGN_KEYS = (
+    ('places', 'user_id', 'users'),
+    ('place_amenity', 'place_id', 'places'),
+    ('place_amenity', 'amenity_id', 'amenities'),
+    ('reviews', 'user_id', 'users'),
+    ('reviews', 'place_id', 'places'),
+)
+
+
+def _convert(convert):
+    """Rewrite the ids of every row with `convert` (SQLite only)."""
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    for table, columns in COLUMNS.items():
+        names = ', '.join(columns)
+        rows = bind.execute(sa.text(
+            f'SELECT rowid, {names} FROM {table}')).all()
+        assignments = ', '.join(f'{column} = :{column}'
+                                for column in columns)
+        for row in rows:
+            values = {column: convert(value)
+                      for column, value in zip(columns, row[1:])}
+            bind.execute(sa.text(
+                f'UPDATE {table} SET {assignments} WHERE rowid = :rowid'),
+                dict(values, rowid=row[0]))
+
+
+def _alter(existing_type, type_):
+    """Change the type of every id column."""
+    dialect = op.get_bind().dialect
+    if dialect.name == 'postgresql':
+        for table, column, _ in FOREIGN_KEYS:
+            op.drop_constraint(f'{table}_{column}_fkey', table,
+                               type_='foreignkey')
+    for table, columns in COLUMNS.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                options = {}
+                if dialect.name == 'postgresql':
+                    options['postgresql_using'] = (
+                        f'{column}::{type_.compile(dialect=dialect)}')
+                batch_op.alter_column(column, existing_type=existing_type,
+                                      type_=type_, existing_nullable=False,
+                                      **options)
+    if dialect.name == 'postgresql':
+        for table, column, referent in FOREIGN_KEYS:
+            op.create_foreign_key(f'{table}_{column}_fkey', table, referent,
+                                  [column], ['id'])
+
+
+def upgrade():
+    _convert(lambda value: uuid.UUID(value).bytes)
+    _alter(sa.String(length=36), BinaryUUID())
+
+
+def downgrade():
+    _convert(lambda value: str(uuid.UUID(bytes=value)))
+    _alter(BinaryUUID(), sa.String(length=36))
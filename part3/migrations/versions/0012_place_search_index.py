@@ -0,0 +1,35 @@
+"""place search index
+
+Index the titles and descriptions of the places in an FTS5 table, filled
+with the existing places under their rowid. The ORM keeps it up to date
+from then on. Only SQLite has FTS5; the other databases get no table.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 05:41:12.518203
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE places_fts USING fts5("
+               "title, description, "
+               "tokenize='unicode61 remove_diacritics 2')")
+    op.execute("INSERT INTO places_fts (rowid, title, description) "
+               "SELECT rowid, title, description FROM places")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP TABLE places_fts")
@@ -1,6 +1,9 @@
+import os
 from app import create_app
+from config import config
 
-app = create_app()
+# FLASK_CONFIG selects the configuration: development, production...
+app = create_app(config[os.getenv('FLASK_CONFIG', 'default')])
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=app.config['DEBUG'])
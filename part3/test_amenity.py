@@ -1,6 +1,9 @@
 import unittest
-from app import create_app
+from unittest import mock
+from sqlalchemy import event
+from app import create_app, db
 from app.models.amenity import Amenity
+from app.services import facade
 
 
 class TestUserEndpoints(unittest.TestCase):
@@ -53,5 +56,64 @@ class TestUserEndpoints(unittest.TestCase):
             new_amenity.update({"name": ""})
 
 
+class TestAmenityNameResolution(unittest.TestCase):
+    """Unit tests for the bulk resolution of amenity names."""
+
+    def setUp(self):
+        """Create an isolated database holding a few amenities."""
+        self.app = create_app("config.TestingConfig")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        for name in ("Wi-Fi", "Pool", "Garage"):
+            facade.create_amenity({"name": name})
+        self.statements = 0
+        event.listen(db.engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        event.remove(db.engine, 'before_cursor_execute', self._count)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _count(self, *args):
+        """Count each statement sent to the database."""
+        self.statements += 1
+
+    def test_names_resolved_in_one_query(self):
+        """Test a list of names is resolved with a single query."""
+        found = facade.get_amenities_by_names(["Wi-Fi", "Pool", "Sauna"])
+        self.assertEqual(sorted(found), ["Pool", "Wi-Fi"])
+        self.assertEqual(self.statements, 1)
+
+    def test_names_served_from_cache(self):
+        """Test names already resolved do not query the database."""
+        facade.get_amenities_by_names(["Wi-Fi", "Pool"])
+        self.statements = 0
+        found = facade.get_amenities_by_names(["Wi-Fi", "Pool"])
+        self.assertEqual(sorted(found), ["Pool", "Wi-Fi"])
+        self.assertEqual(self.statements, 0)
+
+    def test_rename_evicts_name(self):
+        """Test a renamed amenity is no longer found by its old name."""
+        pool = facade.get_amenities_by_names(["Pool"])["Pool"]
+        facade.update_amenity(pool.id, {"name": "Piscine"})
+        self.assertEqual(facade.get_amenities_by_names(["Pool"]), {})
+        self.assertIn("Piscine", facade.get_amenities_by_names(["Piscine"]))
+
+    def test_concurrent_rename_rejected(self):
+        """Test a rename racing another one to the same name returns 400."""
+        client = self.app.test_client()
+        pool = facade.get_amenities_by_names(["Pool"])["Pool"]
+        # The other rename commits between the name check and the update
+        with mock.patch.object(facade, 'get_amenity_by_name',
+                               return_value=None):
+            response = client.put(f'/api/v1/amenities/{pool.id}',
+                                  json={"name": "Garage"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(facade.get_amenity(pool.id).name, "Pool")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,247 @@
+import unittest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import User
+from config import TestingConfig
+from app.ratelimit import MemoryBackend, RateLimiter
+from app.services import facade
+
+
+class FakeClock:
+    """Clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class RecordingBackend(MemoryBackend):
+    """Backend remembering the keys it was asked for."""
+
+    def __init__(self):
+        super().__init__()
+        self.keys = []
+
+    def consume(self, buckets):
+        self.keys.extend(key for key, _, _ in buckets)
+        return super().consume(buckets)
+
+
+class RecordingConfig(TestingConfig):
+    LOGIN_RATE_LIMIT_BACKEND = 'test_auth.RecordingBackend'
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Unit tests for the in-memory token buckets."""
+
+    def test_bucket_refills_over_time(self):
+        """Test a bucket allows `capacity` hits, then refills."""
+        clock = FakeClock()
+        backend = MemoryBackend(clock=clock)
+        for _ in range(3):
+            self.assertEqual(backend.consume([('key', 3, 1)]), [0])
+        self.assertEqual(backend.consume([('key', 3, 1)]), [1])
+        clock.now = 1
+        self.assertEqual(backend.consume([('key', 3, 1)]), [0])
+
+    def test_tokens_taken_from_all_buckets_or_none(self):
+        """Test a bucket rejecting a hit keeps the others' tokens."""
+        backend = MemoryBackend(clock=FakeClock())
+        backend.consume([('empty', 1, 1)])
+        self.assertEqual(backend.consume([('full', 1, 1), ('empty', 1, 1)]),
+                         [0, 1])
+        self.assertEqual(backend.consume([('full', 1, 1)]), [0])
+
+    def test_least_recently_used_buckets_dropped(self):
+        """Test the backend keeps at most `maxsize` buckets."""
+        backend = MemoryBackend(maxsize=2)
+        for key in ('a', 'b', 'c'):
+            backend.consume([(key, 1, 1)])
+        self.assertEqual(backend.size(), 2)
+
+    def test_limiter_counts_rejections_per_scope(self):
+        """Test the limiter reports the scope that rejected an attempt."""
+        limiter = RateLimiter(MemoryBackend(clock=FakeClock()), {
+            'email': {'capacity': 1, 'per_seconds': 60},
+            'ip': {'capacity': 10, 'per_seconds': 60}})
+        self.assertEqual(limiter.hit('a@mail.com', '10.0.0.1'), 0)
+        self.assertEqual(limiter.hit('A@Mail.com ', '10.0.0.1'), 60)
+        self.assertEqual(limiter.hit('b@mail.com', '10.0.0.1'), 0)
+        stats = limiter.stats()
+        self.assertEqual(stats['allowed'], 2)
+        self.assertEqual(stats['rejected'], {'email': 1, 'ip': 0})
+
+
+class TestLoginRateLimit(unittest.TestCase):
+    """Integration tests for the rate limiting of POST /auth/login."""
+
+    def setUp(self):
+        """Set up an isolated database with one user."""
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        db.session.add(User("Light", "Yagami", "light@mail.com", "kira"))
+        db.session.commit()
+        self.limiter = self.app.extensions['login_rate_limiter']
+        self.limiter.limits = {
+            'email': {'capacity': 3, 'per_seconds': 60},
+            'ip': {'capacity': 10, 'per_seconds': 60}}
+        self.limiter.rejected = {'email': 0, 'ip': 0}
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def login(self, password, email="light@mail.com"):
+        return self.client.post('/api/v1/auth/login', json={
+            "email": email, "password": password})
+
+    def test_rejected_before_lookup(self):
+        """Test attempts over the limit get a 429 without any query."""
+        for _ in range(3):
+            self.assertEqual(self.login("wrong").status_code, 401)
+        response = self.login("kira")
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertIn('db;desc="0 queries"',
+                      response.headers['Server-Timing'])
+
+    def test_ip_limit_spans_emails(self):
+        """Test an address is limited whatever the emails it tries."""
+        for index in range(10):
+            self.login("wrong", f"user{index}@mail.com")
+        response = self.login("kira")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.limiter.stats()['rejected']['ip'], 1)
+
+    def test_rejected_attempt_keeps_email_tries(self):
+        """Test an attempt rejected by its address spares its email."""
+        for index in range(10):
+            self.login("wrong", f"user{index}@mail.com")
+        for _ in range(5):
+            self.assertEqual(self.login("wrong").status_code, 429)
+        self.limiter.backend.reset('ip:127.0.0.1')
+        for _ in range(3):
+            self.assertEqual(self.login("wrong").status_code, 401)
+
+    def test_success_forgets_failed_attempts(self):
+        """Test a successful login refills the bucket of its email."""
+        self.login("wrong")
+        self.login("wrong")
+        self.assertEqual(self.login("kira").status_code, 200)
+        for _ in range(3):
+            self.assertEqual(self.login("wrong").status_code, 401)
+
+    def test_metrics(self):
+        """Test admins can read the limiter counters."""
+        self.login("wrong")
+        user = User.query.filter_by(email="light@mail.com").one()
+        user.is_admin = True
+        db.session.commit()
+        headers = {"Authorization": "Bearer " + create_access_token(
+            identity=user.id, additional_claims={"is_admin": True})}
+        response = self.client.get('/api/v1/_metrics/login', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['allowed'], 1)
+
+    def test_pluggable_backend(self):
+        """Test the backend class is read from the configuration."""
+        app = create_app(RecordingConfig)
+        backend = app.extensions['login_rate_limiter'].backend
+        self.assertIsInstance(backend, RecordingBackend)
+        app.extensions['login_rate_limiter'].hit("light@mail.com",
+                                                 "127.0.0.1")
+        self.assertEqual(backend.keys, ['email:light@mail.com',
+                                        'ip:127.0.0.1'])
+
+
+class TestPrincipalCache(unittest.TestCase):
+    """Tests for the resolution of the JWT identities into principals."""
+
+    def setUp(self):
+        """Set up an isolated database with one user."""
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.user = facade.create_user({"first_name": "Light",
+                                        "last_name": "Yagami",
+                                        "email": "light@mail.com",
+                                        "password": "kira"})
+        self.headers = {"Authorization": "Bearer " + create_access_token(
+            identity=self.user.id, additional_claims={"is_admin": False})}
+        self.statements = 0
+        event.listen(db.engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        event.remove(db.engine, 'before_cursor_execute', self._count)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _count(self, *args):
+        self.statements += 1
+
+    def create_place(self):
+        response = self.client.post('/api/v1/places/', headers=self.headers,
+                                    json={"title": "Loft",
+                                          "description": "Nice",
+                                          "price": 80.0,
+                                          "latitude": 48.8,
+                                          "longitude": 2.3})
+        self.assertEqual(response.status_code, 201)
+        return response.get_json()['id']
+
+    def test_principal_cached(self):
+        """Test a principal is read once, then served from the cache."""
+        principal = facade.get_principal(self.user.id)
+        self.assertFalse(principal.is_admin)
+        self.assertEqual(principal.place_ids, frozenset())
+        self.statements = 0
+        self.assertIs(facade.get_principal(self.user.id), principal)
+        self.assertEqual(self.statements, 0)
+
+    def test_new_place_owned_at_once(self):
+        """Test creating a place evicts the cached principal of its owner."""
+        facade.get_principal(self.user.id)
+        place_id = self.create_place()
+        self.assertTrue(facade.get_principal(self.user.id).owns(place_id))
+        response = self.client.put(f'/api/v1/places/{place_id}',
+                                   headers=self.headers,
+                                   json={"title": "Big loft"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_ownership_check_without_query(self):
+        """Test the owner check does not load the user or the owner."""
+        place_id = self.create_place()
+        self.client.put(f'/api/v1/places/{place_id}', headers=self.headers,
+                        json={"title": "Big loft"})
+        self.statements = 0
+        response = self.client.put(f'/api/v1/places/{place_id}',
+                                   headers=self.headers,
+                                   json={"title": "Bigger loft"})
+        self.assertEqual(response.status_code, 200)
+        # The update, the one of the search index of the title, and the
+        # reload of the place for the cache
+        self.assertLessEqual(self.statements, 3)
+
+    def test_unknown_user_rejected(self):
+        """Test a token whose user does not exist gets a 401."""
+        token = create_access_token(identity="missing")
+        response = self.client.get(
+            '/api/v1/_metrics/',
+            headers={"Authorization": "Bearer " + token})
+        self.assertEqual(response.status_code, 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
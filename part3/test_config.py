@@ -0,0 +1,170 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from flask import Flask
+from app import create_app, db
+from app.models.amenity import Amenity
+from app.persistence.cache import get_app_cache
+from app.services import facade
+from config import ProductionConfig, TestingConfig
+
+
+class TestDatabaseSettings(unittest.TestCase):
+    """Check the engine settings taken from the configuration."""
+
+    def test_sqlite_pragmas_applied(self):
+        """Test every SQLite connection runs with the configured pragmas."""
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+        class FileConfig(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+
+        app = create_app(FileConfig)
+        try:
+            with app.app_context(), db.engine.connect() as connection:
+                pragma = connection.exec_driver_sql
+                self.assertEqual(pragma('PRAGMA journal_mode').scalar(),
+                                 'wal')
+                # NORMAL
+                self.assertEqual(pragma('PRAGMA synchronous').scalar(), 1)
+                self.assertEqual(pragma('PRAGMA busy_timeout').scalar(),
+                                 5000)
+                self.assertEqual(pragma('PRAGMA mmap_size').scalar(),
+                                 268435456)
+            with app.app_context():
+                db.engine.dispose()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def test_production_database_url(self):
+        """Test the production settings come from the environment."""
+        environment = {'DATABASE_URL': 'postgres://hbnb@db/hbnb',
+                       'DB_POOL_SIZE': '3'}
+        app = Flask(__name__)
+        with mock.patch.dict(os.environ, environment):
+            ProductionConfig.init_app(app)
+        self.assertEqual(app.config['SQLALCHEMY_DATABASE_URI'],
+                         'postgresql://hbnb@db/hbnb')
+        self.assertEqual(
+            app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'], 3)
+        self.assertTrue(
+            app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_pre_ping'])
+
+    def test_production_requires_database_url(self):
+        """Test a production app is not created without DATABASE_URL."""
+        environment = dict(os.environ)
+        environment.pop('DATABASE_URL', None)
+        with mock.patch.dict(os.environ, environment, clear=True):
+            with self.assertRaises(RuntimeError):
+                create_app(ProductionConfig)
+
+
+class TestReadReplicas(unittest.TestCase):
+    """Check the routing of the reads between a primary and a replica."""
+
+    def setUp(self):
+        """Create a primary and a replica database in two files."""
+        self.paths = []
+        for _ in range(2):
+            handle, path = tempfile.mkstemp(suffix='.db')
+            os.close(handle)
+            self.paths.append(path)
+
+        class ReplicaConfig(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.paths[0]}'
+            SQLALCHEMY_BINDS = {'replica': f'sqlite:///{self.paths[1]}'}
+            READ_REPLICA_BINDS = ('replica',)
+            ENTITY_CACHE = {}
+
+        self.app = create_app(ReplicaConfig)
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        for engine in db.engines.values():
+            db.metadata.create_all(engine)
+        # The same amenity, named after the database holding it
+        self.amenity_id = '0190a4c6-1f00-7000-8000-000000000001'
+        for key, name in ((None, 'Primary'), ('replica', 'Replica')):
+            with db.engines[key].begin() as connection:
+                connection.execute(Amenity.__table__.insert(), {
+                    'id': self.amenity_id, 'name': name})
+
+    def tearDown(self):
+        """Remove both databases."""
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+        self.ctx.pop()
+        # The extension registered a metadata for the bind, which the
+        # other apps of the test run would try to create
+        db.metadatas.pop('replica', None)
+        for path in self.paths:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+    def test_reads_use_replica(self):
+        """Test get, get_all and get_by_attribute read the replica."""
+        self.assertEqual(facade.get_amenity(self.amenity_id).name,
+                         'Replica')
+        self.assertEqual([amenity.name for amenity
+                          in facade.get_all_amenities()], ['Replica'])
+        self.assertIsNotNone(facade.get_amenity_by_name('Replica'))
+        response = self.client.get(f'/api/v1/amenities/{self.amenity_id}')
+        self.assertEqual(response.get_json()['name'], 'Replica')
+
+    def test_writes_use_primary_then_stick(self):
+        """Test a write goes to the primary and later reads follow it."""
+        facade.create_amenity({'name': 'Pool'})
+        with db.engines[None].connect() as connection:
+            names = connection.execute(
+                Amenity.__table__.select()).all()
+        self.assertIn('Pool', [row.name for row in names])
+
+        db.session.expire_all()
+        self.assertEqual(facade.get_amenity(self.amenity_id).name,
+                         'Primary')
+
+    def test_new_session_reads_replica_again(self):
+        """Test the stickiness ends with the session of the request."""
+        facade.create_amenity({'name': 'Pool'})
+        db.session.remove()
+        self.assertEqual(facade.get_amenity(self.amenity_id).name,
+                         'Replica')
+
+    def test_caches_filled_from_primary(self):
+        """Test the caches never keep values read from the replica."""
+        self.app.config['ENTITY_CACHE'] = {
+            'amenity': {'maxsize': 8, 'ttl': 60},
+            'principal': {'maxsize': 8, 'ttl': 60}}
+        self.assertEqual(facade.get_amenity(self.amenity_id).name,
+                         'Primary')
+        db.session.remove()
+        self.assertEqual(
+            get_app_cache('amenity').get(self.amenity_id)['name'], 'Primary')
+
+        owner = facade.create_user({'first_name': 'Jean',
+                                    'last_name': 'Bon',
+                                    'email': 'replica@gmail.com',
+                                    'password': 'secret'})
+        place = facade.create_place({'title': 'Loft',
+                                     'description': 'A nice place to stay',
+                                     'price': 100.0,
+                                     'latitude': 10.0,
+                                     'longitude': 10.0,
+                                     'user': owner})
+        owner_id, place_id = owner.id, place.id
+        db.session.remove()
+        self.assertEqual(facade.get_principal(owner_id).place_ids,
+                         {place_id})
+        # The replica has not received the place yet
+        db.session.remove()
+        self.assertIsNone(facade.get_place(place_id))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User
+
+
+class TestSQLMetrics(unittest.TestCase):
+    """Unit tests for the per-request SQL instrumentation."""
+
+    def setUp(self):
+        """Set up an isolated database and an admin token."""
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.user = User("Light", "Yagami", "light@mail.com", "kira")
+        self.user.is_admin = True
+        db.session.add(self.user)
+        db.session.commit()
+        self.admin_headers = {"Authorization": "Bearer " + create_access_token(
+            identity=self.user.id, additional_claims={"is_admin": True})}
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_server_timing_header(self):
+        """Test each response reports its SQL statements."""
+        response = self.client.get('/api/v1/amenities/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;desc="1 queries"',
+                      response.headers['Server-Timing'])
+
+    def test_metrics_aggregated_per_endpoint(self):
+        """Test the metrics endpoint sums the statements of each endpoint."""
+        self.client.get('/api/v1/amenities/')
+        self.client.get('/api/v1/amenities/')
+        response = self.client.get('/api/v1/_metrics/',
+                                   headers=self.admin_headers)
+        self.assertEqual(response.status_code, 200)
+        totals = response.get_json()['amenities_amenity_list']
+        self.assertEqual(totals['requests'], 2)
+        self.assertEqual(totals['queries'], 2)
+        self.assertIn('FROM amenities', totals['slowest_statement'])
+
+    def test_unmatched_urls_share_one_key(self):
+        """Test the requests matching no endpoint are counted together."""
+        self.client.get('/api/v1/nowhere')
+        self.client.get('/api/v1/elsewhere/1')
+        response = self.client.get('/api/v1/_metrics/',
+                                   headers=self.admin_headers)
+        metrics = response.get_json()
+        self.assertEqual(metrics['<unmatched>']['requests'], 2)
+        self.assertFalse(any(key.startswith('/') for key in metrics))
+
+    def test_metrics_admin_only(self):
+        """Test the token claims cannot make a user an admin."""
+        user = User("Misa", "Amane", "misa@mail.com", "ryuk")
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=user.id,
+                                    additional_claims={"is_admin": True})
+        response = self.client.get(
+            '/api/v1/_metrics/', headers={"Authorization": "Bearer " + token})
+        self.assertEqual(response.status_code, 403)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import os
+import tempfile
+import unittest
+import uuid
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, stamp, upgrade
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects import sqlite
+from app import create_app, db
+from app.models.place import Place, search_index
+from app.models.review import Review
+from app.models.types import BinaryUUID, uuid7
+from app.persistence import geo
+from config import TestingConfig
+
+IDS = {'user': str(uuid.uuid4()), 'place': str(uuid.uuid4()),
+       'review': str(uuid.uuid4())}
+
+# Rows of a user, their place and a review of it
+ROWS = (
+    "INSERT INTO users (id, first_name, last_name, email, password) "
+    "VALUES (:user, 'A', 'B', 'a@b.c', 'x')",
+    "INSERT INTO places (id, title, price, latitude, longitude, user_id) "
+    "VALUES (:place, 'T', 1, 1, 1, :user)",
+    "INSERT INTO reviews (id, text, rating, user_id, place_id) "
+    "VALUES (:review, 'Good', 5, :user, :place)",
+)
+
+# Schema built by db.create_all() before the migrations were introduced
+BASELINE_SCHEMA = (
+    "CREATE TABLE users (first_name VARCHAR(50) NOT NULL, "
+    "last_name VARCHAR(50) NOT NULL, email VARCHAR(120) NOT NULL, "
+    "password VARCHAR(128) NOT NULL, is_admin BOOLEAN, "
+    "id VARCHAR(36) NOT NULL, created_at DATETIME, updated_at DATETIME, "
+    "PRIMARY KEY (id), UNIQUE (email))",
+    "CREATE TABLE amenities (name VARCHAR(50) NOT NULL, "
+    "id VARCHAR(36) NOT NULL, created_at DATETIME, updated_at DATETIME, "
+    "PRIMARY KEY (id))",
+    "CREATE TABLE places (title VARCHAR(50) NOT NULL, "
+    "description VARCHAR(250), price FLOAT NOT NULL, "
+    "latitude FLOAT NOT NULL, longitude FLOAT NOT NULL, "
+    "user_id INTEGER NOT NULL, id VARCHAR(36) NOT NULL, "
+    "created_at DATETIME, updated_at DATETIME, PRIMARY KEY (id), "
+    "FOREIGN KEY(user_id) REFERENCES users (id))",
+    "CREATE TABLE place_amenity (place_id INTEGER NOT NULL, "
+    "amenity_id INTEGER NOT NULL, PRIMARY KEY (place_id, amenity_id), "
+    "FOREIGN KEY(place_id) REFERENCES places (id), "
+    "FOREIGN KEY(amenity_id) REFERENCES amenities (id))",
+    "CREATE TABLE reviews (text VARCHAR(500), rating INTEGER NOT NULL, "
+    "user_id INTEGER NOT NULL, place_id INTEGER NOT NULL, "
+    "id VARCHAR(36) NOT NULL, created_at DATETIME, updated_at DATETIME, "
+    "PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id), "
+    "FOREIGN KEY(place_id) REFERENCES places (id))",
+)
+
+
+class TestMigrations(unittest.TestCase):
+    """Check the migrations build the schema declared by the models."""
+
+    def setUp(self):
+        """Point the app at an empty database file."""
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+        class MigrationConfig(TestingConfig):
+            SQLALCHEMY_DATABASE_URI = f'sqlite:///{self.path}'
+
+        self.app = create_app(MigrationConfig)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        """Remove the database file."""
+        db.session.remove()
+        db.engine.dispose()
+        self.ctx.pop()
+        os.remove(self.path)
+
+    def test_upgrade_matches_models(self):
+        """Test the head revision has every table, column and index."""
+        upgrade()
+        self.assertSchemaMatchesModels()
+
+    def assertSchemaMatchesModels(self):
+        """Assert the database has the schema declared by the models."""
+        with db.engine.connect() as connection:
+            context = MigrationContext.configure(
+                connection,
+                opts=self.app.extensions['migrate'].configure_args)
+            self.assertEqual(compare_metadata(context, db.metadata), [])
+
+    def test_upgrade_stamped_baseline(self):
+        """Test a database created before the migrations is upgraded."""
+        with db.engine.begin() as connection:
+            for statement in BASELINE_SCHEMA + ROWS:
+                connection.execute(text(statement), IDS)
+        stamp(revision='0001')
+        upgrade()
+        self.assertSchemaMatchesModels()
+
+        place = db.session.get(Place, IDS['place'])
+        self.assertEqual(place.geohash, geo.encode(1.0, 1.0))
+        self.assertEqual((place.review_count, place.rating_sum), (1, 5))
+        self.assertEqual([row[0] for row in
+                          search_index.search(Place.query, 't', 10)],
+                         [place])
+
+    def test_foreign_keys_indexed(self):
+        """Test the filtered foreign keys have an index."""
+        upgrade()
+        inspector = inspect(db.engine)
+        for table, column in (('reviews', 'place_id'),
+                              ('places', 'user_id'),
+                              ('place_amenity', 'amenity_id')):
+            indexed = [index['column_names'][0]
+                       for index in inspector.get_indexes(table)]
+            self.assertIn(column, indexed, table)
+
+    def test_foreign_keys_converted(self):
+        """Test the UUIDs stored in the INTEGER foreign keys are kept."""
+        upgrade(revision='0008')
+        with db.engine.begin() as connection:
+            for statement in ROWS:
+                connection.execute(text(statement), IDS)
+        upgrade(revision='0009')
+
+        columns = {column['name']: column['type'] for column
+                   in inspect(db.engine).get_columns('reviews')}
+        self.assertEqual(str(columns['place_id']), 'VARCHAR(36)')
+        self.assertEqual(self._joined_review(), (IDS['review'], 'a@b.c'))
+
+    def test_ids_converted_to_binary(self):
+        """Test the string ids become 16 bytes and still join."""
+        self.test_foreign_keys_converted()
+        upgrade()
+        with db.engine.connect() as connection:
+            stored = connection.execute(text(
+                "SELECT user_id FROM places")).scalar()
+        self.assertEqual(stored, uuid.UUID(IDS['user']).bytes)
+        review = db.session.get(Review, IDS['review'])
+        self.assertEqual((review.user_id, review.place.user.email),
+                         (IDS['user'], 'a@b.c'))
+        self.assertEqual(self._joined_review()[1], 'a@b.c')
+
+        downgrade(revision='0009')
+        self.assertEqual(self._joined_review(), (IDS['review'], 'a@b.c'))
+
+    @staticmethod
+    def _joined_review():
+        """Return the id of the review and the email of the host."""
+        with db.engine.connect() as connection:
+            return tuple(connection.execute(text(
+                "SELECT reviews.id, users.email FROM reviews "
+                "JOIN places ON places.id = reviews.place_id "
+                "JOIN users ON users.id = places.user_id")).one())
+
+    def test_search_index_filled(self):
+        """Test the existing places are indexed, and new ones by the ORM."""
+        self.test_foreign_keys_converted()
+        upgrade()
+        place = db.session.get(Review, IDS['review']).place
+        self.assertEqual([place for place, _ in
+                          search_index.search(Place.query, 't', 10)],
+                         [place])
+        place.title = 'Seaside loft'
+        db.session.commit()
+        self.assertEqual(search_index.search(Place.query, 't', 10).all(), [])
+        self.assertEqual(
+            len(search_index.search(Place.query, 'LOFT', 10).all()), 1)
+
+    def test_downgrade_to_base(self):
+        """Test every revision can be reverted."""
+        upgrade()
+        downgrade(revision='base')
+        self.assertEqual(inspect(db.engine).get_table_names(),
+                         ['alembic_version'])
+
+
+class TestBinaryUUID(unittest.TestCase):
+    """Check the 16-byte ids and their generation."""
+
+    def test_uuid7_time_ordered(self):
+        """Test UUID7 ids have version 7 and sort in creation order."""
+        ids = [uuid7() for _ in range(100)]
+        self.assertTrue(all(value.version == 7 for value in ids))
+        self.assertEqual([value.bytes[:6] for value in ids],
+                         sorted(value.bytes[:6] for value in ids))
+
+    def test_round_trip(self):
+        """Test ids are bound as 16 bytes and read back as strings."""
+        dialect = sqlite.dialect()
+        column_type = BinaryUUID()
+        value = str(uuid7())
+        stored = column_type.process_bind_param(value, dialect)
+        self.assertEqual(len(stored), 16)
+        self.assertEqual(column_type.process_result_value(stored, dialect),
+                         value)
+        self.assertEqual(column_type.process_bind_param(value.upper(),
+                                                        dialect), stored)
+        self.assertIsNone(column_type.process_bind_param("missing",
+                                                         dialect))
+
+
+if __name__ == '__main__':
+    unittest.main()
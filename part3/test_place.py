@@ -1,8 +1,17 @@
+import json
 import unittest
-from app import create_app
+import warnings
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from sqlalchemy.exc import SAWarning
+from app import create_app, db, password_hasher
+from app.hashing import HashingBusyError
+from app.persistence.cache import TTLCache
 from app.models.place import Place
 from app.models.user import User
 from app.services import facade
+from app.services.repositories.place_repository import InMemoryPlaceRepository
 
 
 class TestUserEndpoints(unittest.TestCase):
@@ -215,5 +224,539 @@ class TestUserEndpoints(unittest.TestCase):
                 "owner_id": owner.id})
 
 
+class TestPlacePagination(unittest.TestCase):
+    """Unit tests for the keyset pagination of the place list."""
+
+    def setUp(self):
+        """Create an isolated database holding a few places."""
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        owner = facade.create_user({"first_name": "Jean",
+                                    "last_name": "Bon",
+                                    "email": "page@gmail.com",
+                                    "password": "secret"})
+        self.place_ids = [facade.create_place({
+            "title": f"Place {i}",
+            "description": "A nice place to stay",
+            "price": 100.0,
+            "latitude": float(i),
+            "longitude": float(i),
+            "user": owner}).id for i in range(5)]
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_walk_all_pages(self):
+        """Test following next_cursor returns every place exactly once."""
+        seen = []
+        cursor = None
+        while True:
+            url = '/api/v1/places/?limit=2'
+            if cursor:
+                url += f'&cursor={cursor}'
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.get_json()
+            self.assertLessEqual(len(body['places']), 2)
+            seen.extend(place['id'] for place in body['places'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(sorted(seen), sorted(self.place_ids))
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor returns 400."""
+        response = self.client.get('/api/v1/places/?cursor=nope')
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_limit(self):
+        """Test a non positive limit returns 400."""
+        response = self.client.get('/api/v1/places/?limit=0')
+        self.assertEqual(response.status_code, 400)
+
+    def test_sparse_fields(self):
+        """Test only the columns of the requested fields are selected."""
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            response = self.client.get(
+                '/api/v1/places/?fields=title,rating,title')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(response.status_code, 200)
+        places = response.get_json()['places']
+        self.assertEqual(len(places), 5)
+        self.assertEqual(places[0], {'title': 'Place 0', 'rating': None})
+        selected = statements[0].split(' FROM ')[0]
+        self.assertIn('rating_sum', selected)
+        self.assertNotIn('description', selected)
+        self.assertNotIn('price', selected)
+
+    def test_unknown_field(self):
+        """Test a field that is not exposed returns 400."""
+        response = self.client.get('/api/v1/users/?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/places/?fields=')
+        self.assertEqual(response.status_code, 400)
+
+
+class TestPlaceFilters(unittest.TestCase):
+    """Unit tests for the filters and sort keys of the place list."""
+
+    def setUp(self):
+        """Create places with various prices, amenities and ratings."""
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        owner = facade.create_user({"first_name": "Jean",
+                                    "last_name": "Bon",
+                                    "email": "filter@gmail.com",
+                                    "password": "secret"})
+        wifi = facade.create_amenity({"name": "wifi"})
+        pool = facade.create_amenity({"name": "pool"})
+        # title -> (price, amenities, (review count, rating sum))
+        places = {"Cheap": (50.0, [wifi], (1, 3)),
+                  "Middle": (100.0, [wifi, pool], (2, 9)),
+                  "Dear": (200.0, [pool], (0, 0)),
+                  "Luxury": (400.0, [wifi, pool], (1, 5))}
+        for i, (title, (price, amenities, rating)) in enumerate(
+                places.items()):
+            place = facade.create_place({
+                "title": title,
+                "description": "A nice place to stay",
+                "price": price,
+                "latitude": float(i),
+                "longitude": float(i),
+                "user": owner,
+                "amenities": amenities})
+            facade.place_repo.adjust_rating(place.id, *rating)
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def titles(self, query):
+        """Return the titles of every page of a place list query."""
+        titles = []
+        cursor = None
+        while True:
+            url = f'/api/v1/places/?limit=1&fields=title&{query}'
+            if cursor:
+                url += f'&cursor={cursor}'
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.get_json()
+            titles.extend(place['title'] for place in body['places'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                return titles
+
+    def test_price_range(self):
+        """Test the price bounds are inclusive."""
+        self.assertEqual(self.titles('min_price=100&max_price=200'),
+                         ['Middle', 'Dear'])
+
+    def test_amenities(self):
+        """Test only the places having every amenity are returned."""
+        self.assertEqual(self.titles('amenities=wifi,pool'),
+                         ['Middle', 'Luxury'])
+        self.assertEqual(self.titles('amenities=wifi,wifi'),
+                         ['Cheap', 'Middle', 'Luxury'])
+        self.assertEqual(self.titles('amenities=wifi,spa'), [])
+
+    def test_sort(self):
+        """Test the pages follow the sort key across cursors."""
+        self.assertEqual(self.titles('sort=-price'),
+                         ['Luxury', 'Dear', 'Middle', 'Cheap'])
+        self.assertEqual(self.titles('sort=-rating'),
+                         ['Luxury', 'Middle', 'Cheap', 'Dear'])
+        self.assertEqual(self.titles('sort=price&amenities=pool'),
+                         ['Middle', 'Dear', 'Luxury'])
+
+    def test_invalid_parameters(self):
+        """Test an unknown sort key or a malformed price returns 400."""
+        for query in ('sort=title', 'min_price=cheap'):
+            response = self.client.get(f'/api/v1/places/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+class TestPlaceSearch(unittest.TestCase):
+    """Unit tests for the location search of places."""
+
+    def setUp(self):
+        """Create an isolated database holding places around Paris."""
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.owner = facade.create_user({"first_name": "Jean",
+                                         "last_name": "Bon",
+                                         "email": "geo@gmail.com",
+                                         "password": "secret"})
+        self.places = {}
+        for title, latitude, longitude in [("Louvre", 48.8606, 2.3376),
+                                           ("Orsay", 48.8600, 2.3266),
+                                           ("Versailles", 48.8049, 2.1204),
+                                           ("Lyon", 45.7640, 4.8357)]:
+            self.places[title] = facade.create_place({
+                "title": title,
+                "description": "A nice place to stay",
+                "price": 100.0,
+                "latitude": latitude,
+                "longitude": longitude,
+                "user": self.owner})
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_geohash_follows_coordinates(self):
+        """Test the geohash is recomputed when the place moves."""
+        place = self.places["Lyon"]
+        self.assertTrue(place.geohash.startswith("u0"))
+        facade.update_place(place.id, {"latitude": 48.8607,
+                                       "longitude": 2.3377})
+        self.assertEqual(place.geohash[:7],
+                         self.places["Louvre"].geohash[:7])
+
+    def test_search_radius(self):
+        """Test the search returns the places in the radius, nearest first."""
+        response = self.client.get(
+            '/api/v1/places/search?lat=48.8584&lon=2.2945&radius_km=5')
+        self.assertEqual(response.status_code, 200)
+        titles = [place['title'] for place in response.get_json()['places']]
+        self.assertEqual(titles, ["Orsay", "Louvre"])
+
+    def test_search_large_radius(self):
+        """Test a large radius reaches farther places."""
+        response = self.client.get(
+            '/api/v1/places/search?lat=48.8584&lon=2.2945&radius_km=450')
+        self.assertEqual(len(response.get_json()['places']), 4)
+
+    def test_search_invalid_parameters(self):
+        """Test missing or out of range parameters return 400."""
+        response = self.client.get('/api/v1/places/search?lat=48.8')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            '/api/v1/places/search?lat=95&lon=2.2&radius_km=5')
+        self.assertEqual(response.status_code, 400)
+
+    def test_place_by_localisation(self):
+        """Test the duplicate check needs both coordinates to match."""
+        self.assertTrue(facade.get_place_by_localisation(48.8606, 2.3376))
+        self.assertFalse(facade.get_place_by_localisation(48.8606, 2.3266))
+
+    def test_in_memory_grid(self):
+        """Test the in-memory repository answers like the database."""
+        repo = InMemoryPlaceRepository()
+        for place in self.places.values():
+            repo.add(place)
+        results = repo.get_within_radius(48.8584, 2.2945, 5)
+        self.assertEqual([place.title for place, _ in results],
+                         ["Orsay", "Louvre"])
+        repo.delete(self.places["Orsay"].id)
+        results = repo.get_within_radius(48.8584, 2.2945, 5)
+        self.assertEqual([place.title for place, _ in results], ["Louvre"])
+
+    def test_search_near_pole(self):
+        """Test the boxes are wide enough near the poles."""
+        place = facade.create_place({"title": "Arctic",
+                                     "description": "Ice hut",
+                                     "price": 100.0,
+                                     "latitude": 87.45,
+                                     "longitude": -123.88,
+                                     "user": self.owner})
+        response = self.client.get(
+            '/api/v1/places/search?lat=85.91&lon=-85.71&radius_km=300')
+        self.assertEqual([found['title'] for found in
+                          response.get_json()['places']], ["Arctic"])
+        repo = InMemoryPlaceRepository()
+        repo.add(place)
+        results = repo.get_within_radius(85.91, -85.71, 300)
+        self.assertEqual([found.title for found, _ in results], ["Arctic"])
+
+    def test_search_radius_boundary(self):
+        """Test a place just inside the radius is found."""
+        place = facade.create_place({"title": "Edge",
+                                     "description": "On the circle",
+                                     "price": 100.0,
+                                     "latitude": 22.000657241041516,
+                                     "longitude": -58.84748544200079,
+                                     "user": self.owner})
+        center = (17.50410038843701, -58.84748544200082)
+        response = self.client.get(
+            f'/api/v1/places/search?lat={center[0]}&lon={center[1]}'
+            '&radius_km=500')
+        self.assertEqual([found['title'] for found in
+                          response.get_json()['places']], ["Edge"])
+        repo = InMemoryPlaceRepository()
+        repo.add(place)
+        results = repo.get_within_radius(*center, 500)
+        self.assertEqual([found.title for found, _ in results], ["Edge"])
+
+    def describe(self):
+        """Give the places descriptions to search."""
+        for title, description in [
+                ("Louvre", "Museum view, in the museum district"),
+                ("Orsay", "Quiet Musée museum"),
+                ("Lyon", "Old town loft, far from any museum")]:
+            facade.update_place(self.places[title].id,
+                                {"description": description})
+
+    def test_search_text(self):
+        """Test the keyword search ranks the places having every word."""
+        self.describe()
+        response = self.client.get('/api/v1/places/search?q=museum')
+        self.assertEqual(response.status_code, 200)
+        places = response.get_json()['places']
+        self.assertEqual([place['title'] for place in places],
+                         ["Louvre", "Orsay", "Lyon"])
+        self.assertGreater(places[0]['score'], places[1]['score'])
+        response = self.client.get('/api/v1/places/search?q=quiet+MUSÉE')
+        self.assertEqual([place['title'] for place in
+                          response.get_json()['places']], ["Orsay"])
+        response = self.client.get('/api/v1/places/search?q=nice+"(stay*')
+        self.assertEqual(len(response.get_json()['places']), 1)
+
+    def test_search_text_around(self):
+        """Test the keyword search can be restricted to a radius."""
+        self.describe()
+        response = self.client.get('/api/v1/places/search?q=museum'
+                                   '&lat=48.8584&lon=2.2945&radius_km=5')
+        places = response.get_json()['places']
+        self.assertEqual([place['title'] for place in places],
+                         ["Louvre", "Orsay"])
+        self.assertIn('distance_km', places[0])
+
+    def test_text_index_follows_writes(self):
+        """Test writes look the index rows up by rowid, and reindexing."""
+        self.describe()
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, many):
+            if 'places_fts' in statement:
+                statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            facade.update_place(self.places["Louvre"].id,
+                                {"description": "A quiet garden"})
+            db.session.delete(self.places["Orsay"])
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        self.assertEqual(len(statements), 2)
+        for statement in statements:
+            self.assertIn('places_fts.rowid = (SELECT places.rowid',
+                          statement)
+        response = self.client.get('/api/v1/places/search?q=museum')
+        self.assertEqual([place['title'] for place in
+                          response.get_json()['places']], ["Lyon"])
+        result = self.app.test_cli_runner().invoke(args=['hbnb', 'reindex'])
+        self.assertEqual(result.exit_code, 0)
+        response = self.client.get('/api/v1/places/search?q=garden')
+        self.assertEqual([place['title'] for place in
+                          response.get_json()['places']], ["Louvre"])
+
+    def test_in_memory_text_index(self):
+        """Test the in-memory repository ranks like the database."""
+        self.describe()
+        repo = InMemoryPlaceRepository()
+        for place in self.places.values():
+            repo.add(place)
+        results = repo.search_text("museum", 10)
+        self.assertEqual([place.title for place, _ in results],
+                         ["Louvre", "Orsay", "Lyon"])
+        repo.delete(self.places["Louvre"].id)
+        results = repo.search_text("museum", 10,
+                                   place_ids={self.places["Lyon"].id})
+        self.assertEqual([place.title for place, _ in results], ["Lyon"])
+
+
+class TestPlaceCache(unittest.TestCase):
+    """Unit tests for the read-through cache of places."""
+
+    def setUp(self):
+        """Create an isolated database holding one place."""
+        self.app = create_app("config.TestingConfig")
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        owner = facade.create_user({"first_name": "Jean",
+                                    "last_name": "Bon",
+                                    "email": "cache@gmail.com",
+                                    "password": "secret"})
+        self.place = facade.create_place({
+            "title": "Cached place",
+            "description": "A nice place to stay",
+            "price": 100.0,
+            "latitude": 10.0,
+            "longitude": 10.0,
+            "user": owner})
+        self.statements = 0
+        event.listen(db.engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        event.remove(db.engine, 'before_cursor_execute', self._count)
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def _count(self, *args):
+        """Count each statement sent to the database."""
+        self.statements += 1
+
+    def test_second_get_is_served_from_cache(self):
+        """Test a place read twice is only queried once."""
+        place_id = self.place.id
+        db.session.remove()
+        self.assertEqual(facade.get_place(place_id).title, "Cached place")
+        db.session.remove()
+        self.statements = 0
+        place = facade.get_place(place_id)
+        self.assertEqual(self.statements, 0)
+        self.assertEqual(place.title, "Cached place")
+        self.assertEqual(place.user.first_name, "Jean")
+        stats = facade.get_cache_stats()['place']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_update_evicts_entry(self):
+        """Test an update through the facade is visible on the next get."""
+        place_id = self.place.id
+        facade.get_place(place_id)
+        facade.update_place(place_id, {"title": "Renamed"})
+        db.session.remove()
+        self.assertEqual(facade.get_place(place_id).title, "Renamed")
+
+    def test_malformed_id_not_queried(self):
+        """Test a malformed id finds nothing without querying."""
+        client = self.app.test_client()
+        self.statements = 0
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", SAWarning)
+            self.assertIsNone(facade.get_place("not-an-id"))
+            self.assertFalse(
+                facade.place_repo.exists_by(user_id="not-an-id"))
+            response = client.get('/api/v1/places/not-an-id')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.statements, 0)
+
+    def test_ttl_and_lru_eviction(self):
+        """Test entries expire after the TTL and beyond the size bound."""
+        now = [0]
+        cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 11
+        self.assertIsNone(cache.get("a"))
+
+
+class TestPlaceBulkImport(unittest.TestCase):
+    """Unit tests for the bulk import of places."""
+
+    def setUp(self):
+        """Create an isolated database with an owner and an amenity."""
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.owner = facade.create_user({"first_name": "Jean",
+                                         "last_name": "Bon",
+                                         "email": "bulk@gmail.com",
+                                         "password": "secret"})
+        facade.create_amenity({"name": "Wi-Fi"})
+        token = create_access_token(identity=self.owner.id,
+                                    additional_claims={"is_admin": False})
+        self.headers = {"Authorization": "Bearer " + token}
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    @staticmethod
+    def _row(title, latitude, price=100.0, **extra):
+        """Return an NDJSON line describing a place."""
+        row = {"title": title, "description": "Imported", "price": price,
+               "latitude": latitude, "longitude": 1.0}
+        row.update(extra)
+        return json.dumps(row)
+
+    def test_bulk_import_reports_rejected_rows(self):
+        """Test valid rows are created and bad rows reported by line."""
+        body = "\n".join([
+            self._row("First", 1.0, amenities=["Wi-Fi"]),
+            self._row("Second", 2.0),
+            self._row("Negative", 3.0, price=-1.0),
+            "not json",
+            self._row("Same place", 1.0),
+            self._row("Unknown amenity", 4.0, amenities=["Sauna"]),
+        ])
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", SAWarning)
+            response = self.client.post(
+                '/api/v1/places/bulk?chunk_size=10',
+                data=body, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['line'] for error in report['errors']],
+                         [3, 4, 5, 6])
+        titles = sorted(place.title for place in facade.get_all_places())
+        self.assertEqual(titles, ["First", "Second"])
+        self.assertEqual(sorted(place.title for place in self.owner.places),
+                         ["First", "Second"])
+
+    def test_bulk_import_hashing_busy(self):
+        """Test a busy hashing pool rejects the row, not the import."""
+        lines = ['{"first_name": "A", "last_name": "B", '
+                 '"email": "a@gmail.com", "password": "secret"}']
+        with mock.patch.object(password_hasher, 'hash',
+                               side_effect=HashingBusyError("busy")):
+            report = facade.bulk_import('users', lines, 10)
+        self.assertEqual(report.to_dict()['errors'],
+                         [{'line': 1, 'error': 'Server busy, retry later'}])
+
+    def test_bulk_import_other_owner_forbidden(self):
+        """Test a non admin cannot import places for another user."""
+        body = self._row("Stolen", 1.0, owner_id="someone-else")
+        response = self.client.post('/api/v1/places/bulk',
+                                    data=body, headers=self.headers)
+        self.assertEqual(response.get_json()['failed'], 1)
+
+    def test_import_command(self):
+        """Test the flask hbnb import command loads amenities."""
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['hbnb', 'import', 'amenities', '-'],
+                               input='{"name": "Pool"}\n{"name": ""}\n')
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("1 amenities created, 1 rejected", result.output)
+        self.assertIn("Pool", facade.get_amenities_by_names(["Pool"]))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,9 @@
 import unittest
-from app import create_app
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from app import create_app, db
+from app.models.place import Place
 from app.services import facade
 
 
@@ -176,5 +180,244 @@ class TestReviewEndpoints(unittest.TestCase):
         self.assertEqual(response.status_code, 404)
 
 
+class ReviewTestCase(unittest.TestCase):
+    """Isolated database holding a place of `owner` that `alice` may review."""
+
+    def setUp(self):
+        """Create an isolated database with an owner, a place and Alice."""
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.owner, self.alice = [self._create_user(name)
+                                  for name in ("Owner", "Alice")]
+        self.place = facade.create_place({
+            "title": "Test Place", "description": "A test description",
+            "price": 10.0, "latitude": 1.0, "longitude": 1.0,
+            "user": self.owner})
+
+    def tearDown(self):
+        """Drop the isolated database."""
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    @staticmethod
+    def _create_user(name):
+        """Create a user named `name` User."""
+        return facade.create_user({
+            "first_name": name, "last_name": "User",
+            "email": f"{name.lower()}@gmail.com", "password": "secret"})
+
+    def _headers(self, user):
+        token = create_access_token(identity=user.id,
+                                    additional_claims={"is_admin": False})
+        return {"Authorization": "Bearer " + token}
+
+
+class TestReviewQueryCount(ReviewTestCase):
+    """Check the review endpoints run a constant number of statements."""
+
+    def setUp(self):
+        """Add an amenity and count the executed statements."""
+        super().setUp()
+        self.amenity = facade.create_amenity({"name": "Wi-Fi"})
+        self.reviews_count = 0
+        self.statements = []
+        event.listen(db.engine, 'before_cursor_execute', self._count)
+
+    def tearDown(self):
+        """Stop counting and drop the isolated database."""
+        event.remove(db.engine, 'before_cursor_execute', self._count)
+        super().tearDown()
+
+    def _count(self, conn, cursor, statement, parameters, context,
+               executemany):
+        """Record each statement sent to the database."""
+        self.statements.append(statement)
+
+    def _add_reviews(self, count):
+        """Create `count` places, each reviewed by a new user."""
+        for _ in range(count):
+            self.reviews_count += 1
+            user = facade.create_user({
+                "first_name": "Test", "last_name": "User",
+                "email": f"user{self.reviews_count}@gmail.com",
+                "password": "secret"})
+            place = facade.create_place({
+                "title": "Test Place", "description": "A test description",
+                "price": 10.0, "latitude": float(self.reviews_count),
+                "longitude": 0.0, "user": self.owner,
+                "amenities": [self.amenity]})
+            facade.create_review({"text": "Nice", "rating": 5,
+                                  "place": place, "user": user})
+        db.session.expire_all()
+        return place
+
+    def _statements_for(self, url):
+        """Return the number of statements executed by a GET request."""
+        db.session.remove()
+        self.statements = []
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(self.statements)
+
+    def test_review_list(self):
+        """Test listing reviews does not load authors and places per row."""
+        self._add_reviews(2)
+        small = self._statements_for('/api/v1/reviews/')
+        self._add_reviews(5)
+        self.assertEqual(self._statements_for('/api/v1/reviews/'), small)
+
+    def test_place_detail(self):
+        """Test the place detail loads owner and amenities up front."""
+        place = self._add_reviews(1)
+        self.assertLessEqual(
+            self._statements_for(f'/api/v1/places/{place.id}'), 2)
+
+
+class TestPlaceRatingAggregates(ReviewTestCase):
+    """Check the rating aggregates of a place follow its reviews."""
+
+    def setUp(self):
+        """Add a second reviewer."""
+        super().setUp()
+        self.bob = self._create_user("Bob")
+
+    def _place_rating(self):
+        """Return the rating and review count shown by the place detail."""
+        body = self.client.get(f'/api/v1/places/{self.place.id}').get_json()
+        return body['rating'], body['review_count']
+
+    def test_rating_follows_reviews(self):
+        """Test creating, updating and deleting reviews updates the rating."""
+        self.assertEqual(self._place_rating(), (None, 0))
+        first = facade.create_review({"text": "Nice", "rating": 5,
+                                      "place": self.place,
+                                      "user": self.alice})
+        facade.create_review({"text": "Meh", "rating": 2,
+                              "place": self.place, "user": self.bob})
+        self.assertEqual(self._place_rating(), (3.5, 2))
+        facade.update_review(first.id, {"rating": 3})
+        self.assertEqual(self._place_rating(), (2.5, 2))
+        facade.delete_review(first.id)
+        self.assertEqual(self._place_rating(), (2.0, 1))
+
+    def test_review_change_commits_once(self):
+        """Test a review and its place's rating are committed together."""
+        commits = []
+
+        def count_commit(session):
+            commits.append(session)
+
+        session = db.session()
+        event.listen(session, 'after_commit', count_commit)
+        try:
+            facade.create_review({"text": "Nice", "rating": 5,
+                                  "place": self.place, "user": self.alice})
+        finally:
+            event.remove(session, 'after_commit', count_commit)
+        self.assertEqual(len(commits), 1)
+
+    def test_transaction_rolls_back_on_error(self):
+        """Test nothing is written when a transaction block fails."""
+        with self.assertRaises(ValueError):
+            with facade.transaction():
+                facade.create_review({"text": "Nice", "rating": 5,
+                                      "place": self.place,
+                                      "user": self.alice})
+                facade.create_review({"text": "Nice", "rating": 9,
+                                      "place": self.place,
+                                      "user": self.bob})
+        self.assertEqual(facade.get_all_reviews(), [])
+        self.assertEqual(self._place_rating(), (None, 0))
+
+
+class TestOwnershipChecks(ReviewTestCase):
+    """Check the authorization queries on the foreign keys."""
+
+    def setUp(self):
+        """Add Alice's review of the place."""
+        super().setUp()
+        self.review = facade.create_review({
+            "text": "Great", "rating": 5, "place": self.place,
+            "user": self.alice})
+
+    def test_facade_checks(self):
+        """Test the owner and author checks on existing and other users."""
+        self.assertTrue(facade.is_place_owner(self.place.id, self.owner.id))
+        self.assertFalse(facade.is_place_owner(self.place.id, self.alice.id))
+        self.assertFalse(facade.is_place_owner("missing", self.owner.id))
+        self.assertTrue(facade.is_review_author(self.review.id,
+                                                self.alice.id))
+        self.assertFalse(facade.is_review_author(self.review.id,
+                                                 self.owner.id))
+
+    def test_only_author_updates_review(self):
+        """Test a review can only be changed by its author."""
+        url = f'/api/v1/reviews/{self.review.id}'
+        response = self.client.put(url, json={"text": "Bad", "rating": 1},
+                                   headers=self._headers(self.owner))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.put(url, json={"text": "Good", "rating": 4},
+                                   headers=self._headers(self.alice))
+        self.assertEqual(response.status_code, 200)
+
+    def test_place_unknown_to_cached_principal(self):
+        """Test a place missing from a cached principal is still owned."""
+        facade.get_principal(self.owner.id)
+        # Created behind the back of the facade, e.g. by another process
+        place = Place("Other", "Elsewhere", 20.0, 2.0, 2.0, self.owner)
+        db.session.add(place)
+        db.session.commit()
+        response = self.client.put(f'/api/v1/places/{place.id}',
+                                   json={"title": "Renamed"},
+                                   headers=self._headers(self.owner))
+        self.assertEqual(response.status_code, 200)
+
+
+class TestDuplicateReviews(ReviewTestCase):
+    """Check a user can review a place only once."""
+
+    def setUp(self):
+        """Add Alice's review of the place."""
+        super().setUp()
+        self.review = facade.create_review({
+            "text": "Great", "rating": 5, "place": self.place,
+            "user": self.alice})
+
+    def _post(self):
+        return self.client.post('/api/v1/reviews/', json={
+            "text": "Again", "rating": 1, "place_id": self.place.id},
+            headers=self._headers(self.alice))
+
+    def test_second_review_rejected(self):
+        """Test posting a second review of the same place returns 400."""
+        response = self._post()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['message'],
+                         "You have already reviewed this place.")
+
+    def test_unique_index_enforced(self):
+        """Test a duplicate slipping past the check is rolled back."""
+        with self.assertRaises(IntegrityError):
+            facade.create_review({"text": "Again", "rating": 1,
+                                  "place": self.place, "user": self.alice})
+        db.session.expire_all()
+        place = facade.get_place(self.place.id)
+        self.assertEqual((place.review_count, place.rating_sum), (1, 5))
+
+    def test_concurrent_duplicate_maps_to_400(self):
+        """Test the IntegrityError of a concurrent duplicate is a 400."""
+        facade.has_reviewed = lambda user_id, place_id: False
+        try:
+            response = self._post()
+        finally:
+            del facade.has_reviewed
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(facade.get_place(self.place.id).review_count, 1)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,5 +1,11 @@
+import os
+import signal
+import threading
+import time
 import unittest
-from app import create_app
+from app import create_app, db, password_hasher
+from app.hashing import HashingBusyError, HashingPool, _check_password
+from app.hashing import _hash_password
 from app.models.user import User
 
 
@@ -98,5 +104,178 @@ class TestUserEndpoints(unittest.TestCase):
             user.update({"last_name": ""})
 
 
+class TestPasswordHashing(unittest.TestCase):
+    """Unit tests for the password hashing pool."""
+
+    def test_hash_in_worker_process(self):
+        """Test a hash computed by a worker process can be verified."""
+        pool = HashingPool(rounds=4, workers=1)
+        try:
+            hashed = pool.run(_hash_password, "secret", 4)
+            self.assertTrue(hashed.startswith("$2b$04$"))
+            self.assertTrue(pool.run(_check_password, hashed, "secret"))
+            self.assertFalse(pool.run(_check_password, hashed, "wrong"))
+        finally:
+            pool.shutdown()
+        self.assertEqual(pool.stats()['completed'], 3)
+
+    def test_dead_worker_replaced(self):
+        """Test a worker killed by the system does not break the pool."""
+        pool = HashingPool(rounds=4, workers=1)
+        try:
+            pool.run(_hash_password, "secret", 4)
+            for process in list(pool._executor._processes.values()):
+                os.kill(process.pid, signal.SIGKILL)
+                process.join()
+            hashed = pool.run(_hash_password, "secret", 4)
+            self.assertTrue(pool.run(_check_password, hashed, "secret"))
+        finally:
+            pool.shutdown()
+        self.assertEqual(pool.stats()['completed'], 3)
+        self.assertEqual(pool.stats()['failed'], 0)
+
+    def test_hung_worker_times_out(self):
+        """Test a caller stops waiting for a worker after the timeout."""
+        pool = HashingPool(rounds=4, workers=1, timeout=0.1)
+        try:
+            with self.assertRaises(HashingBusyError):
+                pool.run(time.sleep, 1)
+        finally:
+            pool.shutdown()
+        self.assertEqual(pool.stats()['failed'], 1)
+        self.assertEqual(pool.stats()['completed'], 0)
+
+    def test_pending_operations_are_bounded(self):
+        """Test operations beyond max_pending are rejected, not queued."""
+        pool = HashingPool(rounds=4, workers=0, max_pending=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait()
+
+        worker = threading.Thread(target=pool.run, args=(slow,))
+        worker.start()
+        started.wait()
+        self.assertEqual(pool.stats()['pending'], 1)
+        with self.assertRaises(HashingBusyError):
+            pool.run(_hash_password, "secret", 4)
+        release.set()
+        worker.join()
+        self.assertEqual(pool.stats()['rejected'], 1)
+
+    def test_rounds_follow_config(self):
+        """Test the bcrypt cost comes from BCRYPT_LOG_ROUNDS."""
+        app = create_app("config.TestingConfig")
+        with app.app_context():
+            user = User("Jean", "Bon", "jean@test.com", "secret")
+            self.assertTrue(user.password.startswith("$2b$04$"))
+            self.assertTrue(user.verify_password("secret"))
+
+
+class TestSignupBenchmark(unittest.TestCase):
+    """Hashes per signup and throughput of POST /api/v1/users/.
+
+    The throughput benchmark only runs when SIGNUP_MIN_RATE gives the
+    minimum number of signups per second to reach.
+    """
+
+    SIGNUPS = 20
+
+    def setUp(self):
+        self.app = create_app("config.TestingConfig")
+        self.client = self.app.test_client()
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def signup(self, count):
+        """Sign up `count` new users through the API."""
+        for index in range(count):
+            response = self.client.post('/api/v1/users/', json={
+                "first_name": "Bench",
+                "last_name": "Mark",
+                "email": f"bench{index}@mail.com",
+                "password": "secret"
+            })
+            self.assertEqual(response.status_code, 201)
+
+    def test_signup_hashes_password_once(self):
+        """Test each signup computes exactly one bcrypt hash."""
+        before = password_hasher.stats()['completed']
+        self.signup(self.SIGNUPS)
+        hashes = password_hasher.stats()['completed'] - before
+        self.assertEqual(hashes, self.SIGNUPS)
+
+    @unittest.skipUnless(os.environ.get('SIGNUP_MIN_RATE'),
+                         "set SIGNUP_MIN_RATE to run the benchmark")
+    def test_signup_throughput(self):
+        """Test the signups reach SIGNUP_MIN_RATE users per second."""
+        start = time.perf_counter()
+        self.signup(self.SIGNUPS)
+        rate = self.SIGNUPS / (time.perf_counter() - start)
+        self.assertGreaterEqual(
+            rate, float(os.environ['SIGNUP_MIN_RATE']),
+            f"{rate:.1f} signups/s with BCRYPT_LOG_ROUNDS="
+            f"{password_hasher.stats()['rounds']}")
+
+
+class TestEmailValidation(unittest.TestCase):
+    """Unit tests for the validation modes of the email addresses."""
+
+    def setUp(self):
+        """Record the domains checked instead of querying the DNS."""
+        self.checked = []
+
+        def check(domain, timeout):
+            self.checked.append(domain)
+            return domain != "nomail.com"
+
+        self.app = create_app("config.TestingConfig")
+        self.checker = self.app.extensions['email_checker']
+        self.checker._check = check
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+
+    def tearDown(self):
+        self.checker.shutdown()
+        self.ctx.pop()
+
+    def test_syntax_only(self):
+        """Test the syntax mode never checks the domain."""
+        user = User("Jean", "Bon", "Jean@NoMail.com", "secret")
+        self.assertEqual(user.email, "Jean@nomail.com")
+        with self.assertRaises(ValueError):
+            User("Jean", "Bon", "jean@", "secret")
+        self.assertEqual(self.checked, [])
+
+    def test_background_check(self):
+        """Test a domain is checked once, off the request path."""
+        self.app.config['EMAIL_VALIDATION'] = 'background'
+        User("Jean", "Bon", "jean@nomail.com", "secret")
+        self.checker.shutdown()
+        self.assertEqual(self.checked, ["nomail.com"])
+        with self.assertRaises(ValueError):
+            User("Paul", "Bon", "paul@nomail.com", "secret")
+        User("Jean", "Bon", "jean@mail.com", "secret")
+        User("Paul", "Bon", "paul@mail.com", "secret")
+        self.checker.shutdown()
+        self.assertEqual(self.checked, ["nomail.com", "mail.com"])
+        self.assertEqual(self.checker.stats()['undeliverable'], 1)
+
+    def test_dns_check(self):
+        """Test the dns mode rejects an undeliverable domain at once."""
+        self.app.config['EMAIL_VALIDATION'] = 'dns'
+        with self.assertRaises(ValueError):
+            User("Jean", "Bon", "jean@nomail.com", "secret")
+        self.assertEqual(self.checked, ["nomail.com"])
+
+
 if __name__ == '__main__':
     unittest.main()